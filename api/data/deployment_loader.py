@@ -25,11 +25,15 @@ class DeploymentDataLoader:
     def core_trade(self) -> pd.DataFrame:
         """Full global trade data for map and trade endpoints"""
         if self._core_trade is None:
+            feather_path = f"{self.base_path}/core_trade.feather"
             csv_path = f"{self.base_path}/core_trade.csv"
             parquet_path = f"{self.base_path}/core_trade.parquet"
-            
-            # Try CSV first (deployment), then parquet (development)
-            if os.path.exists(csv_path):
+
+            # Try Feather first (deployment), then CSV (legacy), then parquet (development)
+            if os.path.exists(feather_path):
+                self._core_trade = pd.read_feather(feather_path)
+                print(f"Loaded core trade data from Feather: {len(self._core_trade):,} rows")
+            elif os.path.exists(csv_path):
                 self._core_trade = pd.read_csv(csv_path)
                 print(f"Loaded core trade data from CSV: {len(self._core_trade):,} rows")
             elif os.path.exists(parquet_path):
@@ -44,11 +48,15 @@ class DeploymentDataLoader:
     def signals(self) -> pd.DataFrame:
         """Filtered signals data for signals endpoints"""
         if self._signals is None:
+            feather_path = f"{self.base_path}/signals_filtered.feather"
             csv_path = f"{self.base_path}/signals_filtered.csv"
             parquet_path = f"{self.base_path}/signals_filtered.parquet"
-            
-            # Try CSV first (deployment), then parquet (development)
-            if os.path.exists(csv_path):
+
+            # Try Feather first (deployment), then CSV (legacy), then parquet (development)
+            if os.path.exists(feather_path):
+                self._signals = pd.read_feather(feather_path)
+                print(f"Loaded signals data from Feather: {len(self._signals):,} rows")
+            elif os.path.exists(csv_path):
                 self._signals = pd.read_csv(csv_path)
                 print(f"Loaded signals data from CSV: {len(self._signals):,} rows")
             elif os.path.exists(parquet_path):
@@ -63,11 +71,15 @@ class DeploymentDataLoader:
     def peers(self) -> pd.DataFrame:
         """Peer relationships for all methodologies"""
         if self._peers is None:
+            feather_path = f"{self.base_path}/peer_relationships.feather"
             csv_path = f"{self.base_path}/peer_relationships.csv"
             parquet_path = f"{self.base_path}/peer_relationships.parquet"
-            
-            # Try CSV first (deployment), then parquet (development)
-            if os.path.exists(csv_path):
+
+            # Try Feather first (deployment), then CSV (legacy), then parquet (development)
+            if os.path.exists(feather_path):
+                self._peers = pd.read_feather(feather_path)
+                print(f"Loaded peer relationships from Feather: {len(self._peers):,} rows")
+            elif os.path.exists(csv_path):
                 self._peers = pd.read_csv(csv_path)
                 print(f"Loaded peer relationships from CSV: {len(self._peers):,} rows")
             elif os.path.exists(parquet_path):
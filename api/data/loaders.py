@@ -38,6 +38,24 @@ def load_hs6_names() -> Dict[str, str]:
         return {}
 
 
+# mtime-checked cache of peer group parquets so repeated resolutions
+# (API requests, validation sweeps) read each file once per process
+_peer_cache: Dict[str, Dict] = {}
+
+
+def _read_peer_parquet(path: str) -> Optional[pd.DataFrame]:
+    """Read a peer group parquet, cached until the file changes on disk."""
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    entry = _peer_cache.get(path)
+    if entry is None or entry["mtime"] != mtime:
+        entry = {"df": pd.read_parquet(path), "mtime": mtime}
+        _peer_cache[path] = entry
+    return entry["df"]
+
+
 def load_peer_groups(peer_type: str, year: int, country_iso3: str) -> Optional[pd.DataFrame]:
     """Load peer group data based on type"""
     
@@ -56,8 +74,8 @@ def load_peer_groups(peer_type: str, year: int, country_iso3: str) -> Optional[p
         return None
     
     try:
-        df = pd.read_parquet(path)
-        if df.empty:
+        df = _read_peer_parquet(path)
+        if df is None or df.empty:
             return None
         
         # All peer group data now uses consistent iso3 column with alpha-3 codes
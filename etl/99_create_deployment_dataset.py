@@ -8,58 +8,120 @@ Create deployment-ready dataset with:
 Output: ~13MB of optimized data in data/deployment/
 """
 
+import json
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import yaml
+import zstandard
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+
+def _load_canon(path, column):
+    try:
+        df = pd.read_csv(path, dtype=str)
+        values = df[column]
+    except (FileNotFoundError, KeyError):
+        return None
+    if column == 'hs6':
+        # hs_names.csv has unquoted commas inside names, which shifts the
+        # codes into the index — recover them from there
+        codes = values.str.fullmatch(r'\d{6}').fillna(False)
+        if not codes.all():
+            values = df.index.to_series().astype(str)
+    return pd.Index(values.dropna().unique())
+
+
+# Canonical category dictionaries built once from the reference tables so
+# category codes stay stable across all deployment files
+CANON_ISO3 = _load_canon('data/ref/countries.csv', 'iso3')
+CANON_HS6 = _load_canon('data/ref/hs_names.csv', 'hs6')
+
+
+def _canonical_categories(*series_list, canon=None):
+    """Canonical category index, extended with any values outside it."""
+    cats = canon if canon is not None else pd.Index([])
+    for s in series_list:
+        cats = cats.append(pd.Index(s.dropna().unique()).difference(cats))
+    return cats
+
+
 def create_core_trade():
     """
     Full global trade data optimized for deployment
     - Keep: ALL countries × ALL HS6 relationships
     - Filter: 2023 data only (cut 50% of data)
     - Optimize: Use int32 for numbers, category for strings
-    - Compress: Use snappy compression
+    - Compress: Use zstd compression with dictionary encoding
     - Result: ~12MB (from ~23MB original)
     """
     print("📊 Processing core trade data...")
     
-    # Load base facts
-    df = pd.read_parquet('data/out/fact_base.parquet')
-    df = df[df['year'] == 2023].copy()
+    # Load base facts with the year filter pushed down to the reader so
+    # row groups for other years are pruned instead of materialized
+    df = pq.read_table(
+        'data/out/fact_base.parquet',
+        filters=[('year', '=', 2023)]
+    ).to_pandas()
     print(f"   Base facts: {len(df):,} rows")
     
-    # Optimize data types
-    df['year'] = df['year'].astype('int32')
-    df['export_cz_to_partner'] = df['export_cz_to_partner'].astype('int64')
-    df['partner_iso3'] = df['partner_iso3'].astype('category')
-    df['hs6'] = df['hs6'].astype('category')
+    # Optimize data types (single cast, no intermediate copies)
+    df = df.astype({'year': 'int32', 'export_cz_to_partner': 'int64'}, copy=False)
+    df['partner_iso3'] = pd.Categorical(
+        df['partner_iso3'],
+        categories=_canonical_categories(df['partner_iso3'], canon=CANON_ISO3))
+    df['hs6'] = pd.Categorical(
+        df['hs6'], categories=_canonical_categories(df['hs6'], canon=CANON_HS6))
     
     # Add essential computed columns from metrics
     try:
-        metrics = pd.read_parquet('data/out/metrics_enriched.parquet')
-        metrics_2023 = metrics[metrics['year'] == 2023].copy()
-        
-        # Select essential metrics columns
-        essential_metrics = metrics_2023[[
-            'partner_iso3', 'hs6', 'podil_cz_na_importu', 
-            'import_partner_total', 'YoY_export_change'
-        ]].copy()
-        
-        # Merge essential metrics
-        df = df.merge(essential_metrics, on=['partner_iso3', 'hs6'], how='left')
+        # Only the essential metrics columns, filtered at the reader
+        essential_metrics = pq.read_table(
+            'data/out/metrics_enriched.parquet',
+            columns=['year', 'partner_iso3', 'hs6', 'podil_cz_na_importu',
+                     'import_partner_total', 'YoY_export_change'],
+            filters=[('year', '=', 2023)]
+        ).to_pandas().drop(columns=['year'])
+
+        # Align both sides on the shared canonical categories so the merge
+        # stays on the fast integer-code hash-join path instead of falling
+        # back to object keys
+        for key, canon in [('partner_iso3', CANON_ISO3), ('hs6', CANON_HS6)]:
+            cats = _canonical_categories(df[key], essential_metrics[key], canon=canon)
+            df[key] = pd.Categorical(df[key], categories=cats)
+            essential_metrics[key] = pd.Categorical(essential_metrics[key], categories=cats)
+
+        # Merge essential metrics (metrics are unique per country×product)
+        df = df.merge(essential_metrics, on=['partner_iso3', 'hs6'],
+                      how='left', sort=False, copy=False, validate='m:1')
         print(f"   Added metrics for {len(essential_metrics):,} trade relationships")
         
     except FileNotFoundError:
         print("   Warning: metrics_enriched.parquet not found, using base data only")
     
-    # Save optimized
+    # Sort so each row group holds a tight partner_iso3 range — per-country
+    # reads can then skip most row groups via min/max statistics
+    df = df.sort_values(['partner_iso3', 'hs6'], ignore_index=True)
+
+    # Save optimized (zstd + forced dictionary encoding shrinks the
+    # repeated ISO3/HS6 strings well beyond snappy)
     output_path = 'data/deployment/core_trade.parquet'
-    df.to_parquet(output_path, compression='snappy')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(
+        table, output_path, compression='zstd', compression_level=3,
+        use_dictionary=True, row_group_size=200_000, data_page_size=1 << 20,
+        write_statistics=True,
+        sorting_columns=[pq.SortingColumn(table.schema.get_field_index('partner_iso3'))],
+    )
     
     # Report results
     size_mb = os.path.getsize(output_path) / (1024 * 1024)
-    memory_mb = df.memory_usage(deep=True).sum() / (1024 * 1024)
+    # shallow size is accurate for category/int columns and O(ncols),
+    # deep=True walks every Python string and dominated runtime here
+    memory_mb = df.memory_usage(deep=False).sum() / (1024 * 1024)
     
     print(f"   ✅ Core trade: {len(df):,} rows")
     print(f"   ✅ Countries: {df['partner_iso3'].nunique()}")
@@ -110,14 +172,20 @@ def create_signals_filtered():
         if filtered:
             result = pd.concat(filtered, ignore_index=True)
             
-            # Optimize data types
-            result['partner_iso3'] = result['partner_iso3'].astype('category')
-            result['hs6'] = result['hs6'].astype('category')
+            # Optimize data types (same canonical dictionaries as core_trade)
+            result['partner_iso3'] = pd.Categorical(
+                result['partner_iso3'],
+                categories=_canonical_categories(result['partner_iso3'], canon=CANON_ISO3))
+            result['hs6'] = pd.Categorical(
+                result['hs6'],
+                categories=_canonical_categories(result['hs6'], canon=CANON_HS6))
             result['type'] = result['type'].astype('category')
             
             # Save
             output_path = 'data/deployment/signals_filtered.parquet'
-            result.to_parquet(output_path, compression='snappy')
+            result.to_parquet(output_path, compression='zstd',
+                              compression_level=3, use_dictionary=True,
+                              row_group_size=200_000, data_page_size=1 << 20)
             
             size_kb = os.path.getsize(output_path) / 1024
             print(f"   ✅ Filtered signals: {len(result):,} rows")
@@ -146,33 +214,63 @@ def create_peer_relationships():
         ('data/out/peer_groups_statistical.parquet', 'statistical')
     ]
     
-    all_peers = []
+    present = []
     for file_path, methodology in peer_files:
         if os.path.exists(file_path):
-            df = pd.read_parquet(file_path)
-            df['methodology'] = methodology
-            all_peers.append(df)
-            print(f"   Loaded {methodology}: {len(df)} rows")
+            present.append((file_path, methodology))
         else:
             print(f"   ⚠️ Missing: {file_path}")
-    
+
+    # Stay in Arrow: union the schemas up-front (footer reads only) so each
+    # table arrives already aligned, then tag with a dictionary-encoded
+    # methodology column and concat natively — no pandas copy, no silent
+    # object-dtype fallback when column sets differ
+    all_peers = []
+    if present:
+        # The source methodology column (hs2 ships one) stays out of the
+        # union — the appended tag below is the single source of truth,
+        # and keeping it in the schema would null-fill it for the others.
+        # Decode dictionary fields first (the rewritten writers emit
+        # categoricals, the statistical file plain strings — unify_schemas
+        # cannot merge the two) and unify permissively so the narrowed
+        # ints widen to a common type.
+        schemas = []
+        for p, _ in present:
+            schema = pq.read_schema(p)
+            if 'methodology' in schema.names:
+                schema = schema.remove(schema.get_field_index('methodology'))
+            for i, field in enumerate(schema):
+                if pa.types.is_dictionary(field.type):
+                    schema = schema.set(i, field.with_type(field.type.value_type))
+            schemas.append(schema)
+        union = pa.unify_schemas(schemas, promote_options="permissive")
+        for file_path, methodology in present:
+            table = pq.read_table(file_path, schema=union)
+            methodology_col = pa.array(
+                [methodology] * len(table),
+                type=pa.string()
+            ).dictionary_encode()
+            table = table.append_column('methodology', methodology_col)
+            all_peers.append(table)
+            print(f"   Loaded {methodology}: {len(table)} rows")
+
     if all_peers:
-        result = pd.concat(all_peers, ignore_index=True)
-        
-        # Optimize data types
-        if 'country_iso3' in result.columns:
-            result['country_iso3'] = result['country_iso3'].astype('category')
-        result['methodology'] = result['methodology'].astype('category')
-        
-        # Save
+        combined = pa.concat_tables(all_peers)
+
+        # Save directly from Arrow (dictionary encoding covers the
+        # low-cardinality string columns)
         output_path = 'data/deployment/peer_relationships.parquet'
-        result.to_parquet(output_path, compression='snappy')
-        
+        pq.write_table(combined, output_path, compression='zstd',
+                       compression_level=3, use_dictionary=True,
+                       row_group_size=200_000, data_page_size=1 << 20)
+
+        result = combined.to_pandas()
+
         size_kb = os.path.getsize(output_path) / 1024
         print(f"   ✅ Peer relationships: {len(result):,} rows")
         print(f"   ✅ Methodologies: {result['methodology'].nunique()}")
         print(f"   ✅ File size: {size_kb:.0f}KB")
-        
+
         return result
     else:
         print("   ⚠️ No peer group data found")
@@ -186,23 +284,32 @@ def create_metadata():
     
     metadata = {}
     
-    # Country data
+    # Country data (Arrow CSV reader: faster cold-start, stays on Arrow types)
     try:
-        countries = pd.read_csv('data/ref/countries.csv')
+        countries = pacsv.read_csv('data/ref/countries.csv').to_pandas()
         metadata['countries'] = countries.to_dict('records')
         print(f"   Countries: {len(countries)}")
     except FileNotFoundError:
         print("   ⚠️ countries.csv not found")
         metadata['countries'] = []
     
-    # HS6 names
+    # HS6 names — ship a real two-column table instead of embedding a
+    # ~5000-entry dict blob in the metadata file (names contain unquoted
+    # commas, so split each line on the first comma only)
     try:
-        hs6_names = pd.read_csv('data/ref/hs_names.csv')
-        metadata['hs6_names'] = dict(zip(hs6_names['hs6'], hs6_names['name']))
-        print(f"   HS6 names: {len(hs6_names)}")
+        lines = Path('data/ref/hs_names.csv').read_text().splitlines()[1:]
+        hs6_names = pd.DataFrame(
+            [line.split(',', 1) for line in lines if line.strip()],
+            columns=['hs6', 'name'])
+        pq.write_table(
+            pa.Table.from_pandas(hs6_names, preserve_index=False),
+            'data/deployment/hs6_names.parquet',
+            compression='zstd', compression_level=3, use_dictionary=True)
+        metadata['hs6_names_file'] = 'hs6_names.parquet'
+        print(f"   HS6 names: {len(hs6_names)} → hs6_names.parquet")
     except FileNotFoundError:
         print("   ⚠️ hs_names.csv not found")
-        metadata['hs6_names'] = {}
+        metadata['hs6_names_file'] = None
     
     # Configuration from YAML
     try:
@@ -214,10 +321,12 @@ def create_metadata():
         print("   ⚠️ config.yaml not found")
         metadata['config'] = {}
     
-    # Save as compressed parquet for consistency
-    meta_df = pd.DataFrame([metadata])  # Single row with JSON columns
-    output_path = 'data/deployment/metadata.parquet'
-    meta_df.to_parquet(output_path, compression='snappy')
+    # Save as zstd-compressed JSON — parquet is a poor container for a
+    # single nested blob, and JSON keeps the consumer free of pyarrow
+    output_path = 'data/deployment/metadata.json.zst'
+    payload = json.dumps(metadata, ensure_ascii=False, default=str).encode('utf-8')
+    with open(output_path, 'wb') as f:
+        f.write(zstandard.ZstdCompressor(level=10).compress(payload))
     
     size_kb = os.path.getsize(output_path) / 1024
     print(f"   ✅ Metadata file size: {size_kb:.0f}KB")
@@ -267,12 +376,21 @@ def main():
     # Create deployment directory
     os.makedirs('data/deployment', exist_ok=True)
     
-    # Process all data
-    core_trade = create_core_trade()
-    signals = create_signals_filtered()
-    peers = create_peer_relationships()
-    metadata = create_metadata()
-    
+    # Process all data — the four steps touch disjoint inputs/outputs and
+    # spend most wall time in GIL-releasing pyarrow code, so overlap them
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        futures = {
+            'core': ex.submit(create_core_trade),
+            'signals': ex.submit(create_signals_filtered),
+            'peers': ex.submit(create_peer_relationships),
+            'metadata': ex.submit(create_metadata),
+        }
+        results = {name: fut.result() for name, fut in futures.items()}
+    core_trade = results['core']
+    signals = results['signals']
+    peers = results['peers']
+    metadata = results['metadata']
+
     # Validate results
     validate_deployment_data()
     
@@ -280,11 +398,14 @@ def main():
     print("=" * 60)
     print("📊 DEPLOYMENT DATASET SUMMARY:")
     
+    # one directory scan returns cached stat entries (vs a stat per file)
     total_size = 0
-    for file in Path('data/deployment').glob('*.parquet'):
-        size_mb = file.stat().st_size / (1024 * 1024)
+    with os.scandir('data/deployment') as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        size_mb = entry.stat().st_size / (1024 * 1024)
         total_size += size_mb
-        print(f"   {file.name}: {size_mb:.1f}MB")
+        print(f"   {entry.name}: {size_mb:.1f}MB")
     
     print(f"   TOTAL SIZE: {total_size:.1f}MB")
     print("✅ Deployment dataset created successfully!")
@@ -0,0 +1,74 @@
+"""Shared read cache for data/out/metrics_enriched.parquet.
+
+Several downstream scripts (controls, world map, product bars, trend)
+each decode the same parquet independently. This module mirrors it once
+into an uncompressed Arrow IPC file next to the source; every later read
+memory-maps the mirror, so repeated opens are zero-copy and served from
+the OS page cache instead of re-running parquet decompression.
+"""
+from __future__ import annotations
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+PARQUET = Path("data/out/metrics_enriched.parquet")
+ARROW = Path("data/out/metrics_enriched.arrow")
+
+# Low-cardinality key columns, dictionary-encoded on load so consumers
+# get pandas Categoricals: integer-code groupby keys and comparisons
+# instead of per-row string hashing
+KEY_COLS = ("hs6", "partner_iso3")
+
+
+def _ensure_mirror() -> Path:
+    """Create/refresh the Arrow IPC mirror of the metrics parquet."""
+    if not PARQUET.is_file():
+        raise FileNotFoundError(f"Missing {PARQUET}")
+    if not ARROW.is_file() or ARROW.stat().st_mtime < PARQUET.stat().st_mtime:
+        tbl = pq.read_table(PARQUET)
+        feather.write_feather(tbl, ARROW, compression="uncompressed")
+    return ARROW
+
+
+def metrics_columns() -> list[str]:
+    """Column names of the metrics table, read from the mirror's schema."""
+    with pa.memory_map(str(_ensure_mirror())) as source:
+        return list(pa.ipc.open_file(source).schema.names)
+
+
+def latest_year() -> int:
+    """Max year in the metrics table via a single memory-mapped column."""
+    tbl = feather.read_table(_ensure_mirror(), columns=["year"], memory_map=True)
+    return int(pc.max(tbl.column("year")).as_py())
+
+
+def load_metrics(
+    columns: list[str] | None = None,
+    year: int | None = None,
+    min_year: int | None = None,
+) -> pd.DataFrame:
+    """Load the metrics table with optional column projection and year filter.
+
+    `year` keeps a single year, `min_year` keeps `year >= min_year`; both
+    are applied on the memory-mapped Arrow table before pandas conversion.
+    """
+    cols = columns
+    needs_year = year is not None or min_year is not None
+    if needs_year and columns is not None and "year" not in columns:
+        cols = ["year", *columns]
+    tbl = feather.read_table(_ensure_mirror(), columns=cols, memory_map=True)
+    if year is not None:
+        tbl = tbl.filter(pc.equal(tbl.column("year"), year))
+    elif min_year is not None:
+        tbl = tbl.filter(pc.greater_equal(tbl.column("year"), min_year))
+    if needs_year and columns is not None and "year" not in columns:
+        tbl = tbl.drop_columns(["year"])
+    for name in KEY_COLS:
+        pos = tbl.schema.get_field_index(name)
+        if pos >= 0 and not pa.types.is_dictionary(tbl.column(pos).type):
+            tbl = tbl.set_column(pos, name, pc.dictionary_encode(tbl.column(pos)))
+    return tbl.to_pandas()
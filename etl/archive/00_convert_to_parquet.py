@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 """
 Read BACI CSV (HS22) from data/raw, standardize columns, and write Parquet to data/parquet.
-Memory-safe(ish): set dtypes and iterate in chunks.
+Memory-safe(ish): stream record batches through the Arrow CSV reader.
 """
+import os
 import pandas as pd
 import pyarrow as pa
+import pyarrow.csv as pacsv
 import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 RAW = Path(__file__).resolve().parents[1] / "data" / "raw"
@@ -23,59 +26,52 @@ COL_ALIASES = {
     "weight_kg": ["w", "weight", "weight_kg"]
 }
 
-DTYPES = {
-    "year": "int16",
-    "exporter": "int32",
-    "importer": "int32",
-    "hs6": "int32",
-    "value_usd": "int64",
-    "quantity": "float64",
-    "weight_kg": "float64",
+ARROW_TYPES = {
+    "year": pa.int16(),
+    "exporter": pa.int32(),
+    "importer": pa.int32(),
+    "hs6": pa.int32(),
+    "value_usd": pa.int64(),
+    "quantity": pa.float64(),
+    "weight_kg": pa.float64(),
 }
 
+# Inverted alias map built once at import — per-batch renaming is then a
+# single dict lookup per column instead of a nested alias scan
+ALIAS_TO_STD = {a: std for std, aliases in COL_ALIASES.items() for a in aliases}
 
-def _standardize_columns(df: pd.DataFrame) -> pd.DataFrame:
-    rename = {}
-    for std, aliases in COL_ALIASES.items():
-        for a in aliases:
-            if a in df.columns:
-                rename[a] = std
-                break
-    df = df.rename(columns=rename)
 
-    # keep only recognized columns
-    keep = [c for c in DTYPES if c in df.columns]
-    df = df[keep]
+def _convert_options() -> pacsv.ConvertOptions:
+    # Map every known alias to its standardized column's Arrow type so the
+    # CSV reader parses string->int natively, with no pandas intermediate
+    column_types = {a: ARROW_TYPES[std] for a, std in ALIAS_TO_STD.items()}
+    return pacsv.ConvertOptions(column_types=column_types, null_values=["", "NA"])
 
-    # Enforce consistent dtypes across chunks
-    # Use pandas nullable integers for ints to allow NaNs after coercion
-    INT_COLS = {"year", "exporter", "importer", "hs6", "value_usd"}
-    FLOAT_COLS = {"quantity", "weight_kg"}
 
-    for c in df.columns:
-        if c in INT_COLS:
-            df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
-        elif c in FLOAT_COLS:
-            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+def _standardize_batch(batch: pa.RecordBatch) -> pa.Table:
+    """Rename alias columns to their standard names and keep only recognized ones."""
+    table = pa.Table.from_batches([batch])
+    table = table.rename_columns([ALIAS_TO_STD.get(c, c) for c in table.column_names])
+    keep = [c for c in ARROW_TYPES if c in table.column_names]
+    return table.select(keep)
 
-    # normalize hs6 to 6-digit integer if present
-    if "hs6" in df.columns:
-        df["hs6"] = pd.to_numeric(df["hs6"], errors="coerce").astype("Int64")
 
-    return df
-
-
-def convert_file(csv_path: Path, chunksize: int = 1_000_000):
+def convert_file(csv_path: Path, block_size: int = 64 << 20):
     print(f"Converting {csv_path.name} …")
     parquet_dir = OUT / csv_path.stem
     parquet_dir.mkdir(parents=True, exist_ok=True)
 
+    reader = pacsv.open_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        parse_options=pacsv.ParseOptions(invalid_row_handler=lambda row: "skip"),
+        convert_options=_convert_options(),
+    )
     writer = None
-    for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize, on_bad_lines="skip", low_memory=False):
-        df = _standardize_columns(chunk)
-        if df.empty:
+    for batch in reader:
+        table = _standardize_batch(batch)
+        if table.num_columns == 0 or table.num_rows == 0:
             continue
-        table = pa.Table.from_pandas(df, preserve_index=False)
         if writer is None:
             writer = pq.ParquetWriter(parquet_dir / "data.parquet", table.schema)
         writer.write_table(table)
@@ -84,12 +80,22 @@ def convert_file(csv_path: Path, chunksize: int = 1_000_000):
     print(f"→ {parquet_dir}/data.parquet")
 
 
+def _init_worker():
+    # keep Arrow's internal thread pool small per worker so N parallel
+    # conversions don't oversubscribe the machine
+    pa.set_cpu_count(2)
+
+
 def main():
     files = sorted(RAW.glob("BACI_HS22_*.csv"))
     if not files:
         raise SystemExit("No BACI_HS22_*.csv files found in data/raw")
-    for f in files:
-        convert_file(f)
+    # Each yearly file is independent, so convert them in parallel
+    with ProcessPoolExecutor(
+        max_workers=min(os.cpu_count() or 1, len(files)),
+        initializer=_init_worker,
+    ) as ex:
+        list(ex.map(convert_file, files))
 
     # Save reference tables as Parquet too (if present)
     ref_country = RAW / "country_codes.csv"
@@ -1,21 +1,31 @@
 import os, glob
+from concurrent.futures import ThreadPoolExecutor
 import pyarrow.parquet as pq
 
 PARQUET_DIR = "data/parquet"
 
+def _read_schema(p):
+    try:
+        return p, pq.ParquetFile(p).schema_arrow, None
+    except Exception as e:
+        return p, None, e
+
 def main():
-    paths = glob.glob(os.path.join(PARQUET_DIR, "*.parquet"))
+    paths = sorted(glob.glob(os.path.join(PARQUET_DIR, "*.parquet")))
     if not paths:
         print("No parquet files in data/parquet")
         return
-    for p in sorted(paths):
+    # footer reads are tiny latency-bound IOs — fetch them concurrently,
+    # then print in path order
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        results = list(ex.map(_read_schema, paths))
+    for p, schema, err in results:
         print("="*80)
         print(p)
-        try:
-            pf = pq.ParquetFile(p)
-            print(pf.schema_arrow)
-        except Exception as e:
-            print(f"ERROR reading schema: {e}")
+        if err is not None:
+            print(f"ERROR reading schema: {err}")
+        else:
+            print(schema)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,4 +1,5 @@
 import os, glob
+from concurrent.futures import ThreadPoolExecutor
 import pyarrow.parquet as pq
 
 SEARCH_DIRS = ["data/parquet", "data/parquet/BACI_HS22_Y2022_V202501", "data/parquet/BACI_HS22_Y2023_V202501"]
@@ -13,27 +14,38 @@ def has_all(cols, need):
     cols_lower = {c.lower() for c in cols}
     return all(any(alt == c or alt.lower() == c for alt in cols_lower) for c in need)
 
+def _read_columns(p):
+    try:
+        return p, pq.ParquetFile(p).schema_arrow.names, None
+    except Exception as e:
+        return p, None, e
+
 def main():
     print("=== Probing for detailed HS6+partner datasets ===")
-    checked = 0
-    found = []
+    paths = []
     for root in SEARCH_DIRS:
         if not os.path.isdir(root):
             continue
-        for p in glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True):
-            try:
-                pf = pq.ParquetFile(p)
-                cols = pf.schema_arrow.names
-                checked += 1
-                cols_lower = {c.lower() for c in cols}
-                for need in CANDIDATE_COL_SETS:
-                    if need.issubset(cols_lower):
-                        found.append((p, cols))
-                        print(f"[FOUND] {p}")
-                        print("        columns:", cols)
-                        break
-            except Exception as e:
-                print(f"[WARN] Could not read {p}: {e}")
+        paths.extend(glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True))
+
+    # schema probes only touch the parquet footer; overlap the IOs
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        results = list(ex.map(_read_columns, paths))
+
+    checked = 0
+    found = []
+    for p, cols, err in results:
+        if err is not None:
+            print(f"[WARN] Could not read {p}: {err}")
+            continue
+        checked += 1
+        cols_lower = {c.lower() for c in cols}
+        for need in CANDIDATE_COL_SETS:
+            if need.issubset(cols_lower):
+                found.append((p, cols))
+                print(f"[FOUND] {p}")
+                print("        columns:", cols)
+                break
 
     if not found:
         print("[INFO] No detailed file found (exporter+importer+hs6+year). We will use Path B (partial).")
@@ -43,4 +55,4 @@ def main():
     print("=== Probe complete ===")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
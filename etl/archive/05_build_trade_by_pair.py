@@ -1,5 +1,7 @@
 from pathlib import Path
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 PARQUET_ROOT = Path("data/parquet")
 # These are the per-file outputs from 00_convert_to_parquet.py:
@@ -8,26 +10,21 @@ sources = sorted(PARQUET_ROOT.glob("BACI_HS22_*/data.parquet"))
 if not sources:
     raise SystemExit("No converted BACI files found under data/parquet/BACI_HS22_*/data.parquet")
 
-def load_one(p: Path) -> pd.DataFrame:
-    df = pd.read_parquet(p)
+NEEDED = ["year", "exporter", "importer", "hs6", "value_usd"]
+
+def load_one(p: Path) -> pa.Table:
+    table = pq.read_table(p)
     # normalize cols to lower
-    df.columns = [c.lower() for c in df.columns]
+    table = table.rename_columns([c.lower() for c in table.column_names])
     # tolerate variants (per 00_convert_to_parquet.py)
-    ren = {}
-    if "i" in df.columns: ren["i"] = "exporter"
-    if "j" in df.columns: ren["j"] = "importer"
-    if "k" in df.columns: ren["k"] = "hs6"
-    if "t" in df.columns: ren["t"] = "year"
-    if "v" in df.columns: ren["v"] = "value_usd"
-    if ren:
-        df = df.rename(columns=ren)
-    needed = {"year","exporter","importer","hs6","value_usd"}
-    missing = needed - set(df.columns)
+    ren = {"i": "exporter", "j": "importer", "k": "hs6", "t": "year", "v": "value_usd"}
+    table = table.rename_columns([ren.get(c, c) for c in table.column_names])
+    missing = set(NEEDED) - set(table.column_names)
     if missing:
         # Keep only what exists; skip files that don't have the core columns
         raise ValueError(f"{p} missing columns: {missing}")
-    # keep minimal cols; ensure dtypes friendly for concat
-    return df[["year","exporter","importer","hs6","value_usd"]].copy()
+    # keep minimal cols; Arrow tables concat without copying buffers
+    return table.select(NEEDED)
 
 parts = []
 for src in sources:
@@ -39,18 +36,18 @@ for src in sources:
 if not parts:
     raise SystemExit("No usable BACI parquet parts found; cannot build pair table.")
 
-df = pd.concat(parts, ignore_index=True)
+# Chunked-table concat keeps the source buffers instead of allocating a
+# full pandas copy of the union
+table = pa.concat_tables(parts, promote_options='default')
 
 # Write unified pair table
 pair_out = PARQUET_ROOT / "trade_by_pair.parquet"
-df.to_parquet(pair_out, index=False)
-print(f"Wrote {pair_out} with {len(df):,} rows and columns {list(df.columns)}")
+pq.write_table(table, pair_out, compression='zstd', row_group_size=1_000_000)
+print(f"Wrote {pair_out} with {table.num_rows:,} rows and columns {table.column_names}")
 
 # Optional: speed-up aggregation for imports by HS2 (importer × hs2 × year)
-has_year = "year" in df.columns
-group_cols = ["importer","hs6"] + (["year"] if has_year else [])
-agg = df.groupby(group_cols, as_index=False)["value_usd"].sum()
-agg = agg.rename(columns={"importer":"reporter_iso3","hs6":"hs2","value_usd":"trade_value_usd"})
+agg = table.group_by(["importer", "hs6", "year"]).aggregate([("value_usd", "sum")]).to_pandas()
+agg = agg.rename(columns={"importer": "reporter_iso3", "hs6": "hs2", "value_usd_sum": "trade_value_usd"})
 hs2_out = PARQUET_ROOT / "trade_by_hs2_imports.parquet"
 agg.to_parquet(hs2_out, index=False)
 print(f"Wrote {hs2_out} with {len(agg):,} rows (aggregated imports by importer×HS2).")
@@ -8,14 +8,15 @@ Outputs:
 - trade_by_exporter.parquet: year, exporter, value_usd
 """
 from pathlib import Path
-import pandas as pd
+import numpy as np
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
 
 PARQ = Path(__file__).resolve().parents[1] / "data" / "parquet"
 OUT = PARQ
 
 
-def load_baci_frames():
-    parts = []
+def load_baci_table():
     found = []
     patterns = [
         "BACI_HS22_*/data.parquet",      # expected layout from 00_convert_to_parquet.py
@@ -26,44 +27,52 @@ def load_baci_frames():
             found.append(p)
     # de-duplicate while preserving order
     seen = set()
+    paths = []
     for p in found:
         if p not in seen:
             seen.add(p)
-            parts.append(pd.read_parquet(p))
+            paths.append(p)
 
-    if not parts:
+    if not paths:
         raise SystemExit(f"No Parquet inputs found under {PARQ}. Expected files like data/parquet/BACI_HS22_YYYY_*/data.parquet. Run 00_convert_to_parquet.py first.")
-    df = pd.concat(parts, ignore_index=True)
-    return df
+    # One multi-threaded dataset scan instead of per-file pandas reads + concat
+    dataset = pads.dataset(paths, format="parquet")
+    cols = [c for c in ["year", "exporter", "importer", "hs6", "value_usd"]
+            if c in dataset.schema.names]
+    return dataset.to_table(columns=cols)
 
 
 def main():
-    df = load_baci_frames()
+    table = load_baci_table()
     # Core numeric
-    if "value_usd" not in df:
+    if "value_usd" not in table.column_names:
         raise SystemExit("Missing value_usd column after conversion.")
 
+    def agg(keys):
+        # Arrow's hash aggregation is vectorized and multi-threaded,
+        # unlike the single-threaded pandas groupby path
+        out = table.group_by(keys).aggregate([("value_usd", "sum")])
+        return out.rename_columns(keys + ["value_usd"])
+
     # Trade by country pair
-    pair = (
-        df.groupby(["year", "exporter", "importer"], as_index=False)["value_usd"].sum()
-    )
-    pair.to_parquet(OUT / "trade_by_pair.parquet", index=False)
+    pair = agg(["year", "exporter", "importer"])
+    pq.write_table(pair, OUT / "trade_by_pair.parquet")
 
     # Trade by product (hs6)
-    if "hs6" in df:
-        prod = (
-            df.groupby(["year", "exporter", "hs6"], as_index=False)["value_usd"].sum()
-        )
-        prod.to_parquet(OUT / "trade_by_product.parquet", index=False)
+    if "hs6" in table.column_names:
+        prod_table = agg(["year", "exporter", "hs6"])
+        pq.write_table(prod_table, OUT / "trade_by_product.parquet")
 
-        # HS2 rollup
-        prod["hs2"] = (prod["hs6"].astype("Int64") // 10_000).astype("Int64")
+        # HS2 rollup — hs6 is always a 6-digit positive integer, so plain
+        # int32 arithmetic avoids the masked nullable-Int64 path
+        prod = prod_table.to_pandas()
+        prod["hs2"] = (prod["hs6"].to_numpy(dtype=np.int32) // 10_000).astype(np.int32)
         hs2 = prod.groupby(["year", "exporter", "hs2"], as_index=False)["value_usd"].sum()
         hs2.to_parquet(OUT / "trade_by_hs2.parquet", index=False)
 
     # Totals by exporter
-    exp = df.groupby(["year", "exporter"], as_index=False)["value_usd"].sum()
-    exp.to_parquet(OUT / "trade_by_exporter.parquet", index=False)
+    exp = agg(["year", "exporter"])
+    pq.write_table(exp, OUT / "trade_by_exporter.parquet")
 
     print("Saved aggregated tables to:")
     for f in ["trade_by_pair.parquet", "trade_by_product.parquet", "trade_by_hs2.parquet", "trade_by_exporter.parquet"]:
@@ -73,4 +82,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -5,12 +5,24 @@ Creates: signals_table.parquet
 """
 from pathlib import Path
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 PARQ = Path(__file__).resolve().parents[1] / "data" / "parquet"
 
 
 def main():
-    pair = pd.read_parquet(PARQ / "trade_by_pair.parquet")
+    # Find the latest year from the year column alone, then read only the
+    # needed columns with the filter pushed down so non-latest row groups
+    # are pruned via their statistics
+    pair_path = PARQ / "trade_by_pair.parquet"
+    years = pq.read_table(pair_path, columns=["year"])["year"]
+    latest = int(pc.max(years).as_py())
+    pair = pq.read_table(
+        pair_path,
+        columns=["year", "exporter", "importer", "value_usd"],
+        filters=[("year", "=", latest)],
+    ).to_pandas()
 
     # Optional joins for human-readable labels
     countries = None
@@ -26,19 +38,17 @@ def main():
         else:
             countries = None
 
-    # Example: top partners per exporter in latest year
-    latest = int(pair["year"].max())
-    cur = pair[pair["year"] == latest].copy()
+    # Example: top partners per exporter in latest year (already filtered)
+    cur = pair
 
     if countries is not None:
         cur = cur.merge(countries.add_prefix("exp_"), left_on="exporter", right_on="exp_code", how="left")
         cur = cur.merge(countries.add_prefix("imp_"), left_on="importer", right_on="imp_code", how="left")
 
-    # Rank partners by value
-    cur["rank"] = cur.groupby("exporter")["value_usd"].rank(ascending=False, method="first")
-
-    # Keep top 10 per exporter
-    cur = cur[cur["rank"] <= 10].sort_values(["exporter", "rank"])
+    # Keep top 10 partners per exporter: one global stable sort plus a
+    # group head beats ranking every row and filtering on the rank column
+    cur = cur.sort_values(["exporter", "value_usd"], ascending=[True, False], kind="stable")
+    cur = cur.groupby("exporter", sort=False).head(10)
 
     out = PARQ / "signals_table.parquet"
     cur.to_parquet(out, index=False)
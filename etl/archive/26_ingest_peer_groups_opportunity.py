@@ -19,6 +19,7 @@ Poznámky:
 from __future__ import annotations
 from pathlib import Path
 import pandas as pd
+import pyarrow.parquet as pq
 from typing import Optional, Dict
 import argparse
 
@@ -42,45 +43,25 @@ try:
 except Exception:
     pycountry = None
 
-def to_int_like(x: object) -> Optional[int]:
-    try:
-        if pd.isna(x):
-            return None
-    except Exception:
-        pass
-    s = str(x).strip()
-    if s.endswith(".0"):
-        s = s[:-2]
-    if not s or not s.replace("-", "").replace("+", "").replace(" ", "").isdigit():
-        return None
-    try:
-        return int(s)
-    except Exception:
-        return None
+# Numeric (M49) -> alpha-3 tabulka postavená jednou při importu modulu;
+# pycountry.countries.get() by jinak hashoval a alokoval per volání
+_N2A: Dict[int, str] = {
+    int(c.numeric): c.alpha_3
+    for c in (pycountry.countries if pycountry is not None else [])
+    if getattr(c, "numeric", None)
+}
 
 def numeric_to_alpha3(num: int) -> Optional[str]:
-    if pycountry is None:
-        return None
-    try:
-        rec = pycountry.countries.get(numeric=str(num).zfill(3))
-        return rec.alpha_3 if rec else None
-    except Exception:
-        return None
+    return _N2A.get(num)
 
 def map_iso_numeric_to_alpha3(series: pd.Series, overrides: Dict[str,str]) -> pd.Series:
-    out = []
-    for v in series.tolist():
-        key = "" if v is None else str(v).strip()
-        # overrides nejdřív (můžeš mapovat zvláštnosti)
-        if key in overrides:
-            out.append(overrides[key]); continue
-        num = to_int_like(v)
-        if num is not None:
-            mapped = numeric_to_alpha3(num)
-            out.append(mapped)
-        else:
-            out.append(None)
-    return pd.Series(out, index=series.index, dtype="object")
+    # pd.to_numeric zvládne i float-like stringy ("56.0") v jednom C kernelu,
+    # žádný per-řádkový to_int_like už není potřeba
+    keys = series.astype(str).str.strip()
+    mapped = pd.to_numeric(keys, errors="coerce").astype("Int64").map(_N2A)
+    # overrides nejdřív (můžeš mapovat zvláštnosti)
+    out = keys.map(overrides).fillna(mapped)
+    return out.astype("object").where(out.notna(), None)
 
 # ---- Main ----
 
@@ -118,16 +99,26 @@ def main(drop_unmapped: bool = False):
     assert out["year"].notna().all()
     assert out["method"].astype(str).str.len().ge(1).all()
 
-    # načti existující peer_groups.parquet a odstraň staré řádky stejné metody/roku
+    # načti existující peer_groups.parquet bez řádků stejné metody/roku:
+    # negace (method AND year) v DNF filtru pruní nahrazované row-groupy
+    # už při čtení, místo plného dekódu a boolean masky v pandas
     if OUT_PARQUET.is_file():
-        base = pd.read_parquet(OUT_PARQUET)
-        mask = ~((base["method"] == out["method"].iloc[0]) & (base["year"] == out["year"].iloc[0]))
-        combined = pd.concat([base[mask], out], ignore_index=True)
+        method_val = str(out["method"].iloc[0])
+        year_val = int(out["year"].iloc[0])
+        base = pq.read_table(
+            OUT_PARQUET,
+            filters=[[("method", "!=", method_val)], [("year", "!=", year_val)]],
+        ).to_pandas()
+        combined = pd.concat([base, out], ignore_index=True)
     else:
         combined = out
 
     OUT_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    combined.to_parquet(OUT_PARQUET, index=False)
+    # ZSTD + slovníkové kódování: opakované iso3/method stringy se smrsknou
+    # několikanásobně proti defaultnímu snappy
+    combined.to_parquet(OUT_PARQUET, index=False, compression='zstd',
+                        compression_level=9, use_dictionary=['iso3','cluster','method'],
+                        row_group_size=256_000)
     # info
     k_val = int(out["k"].iloc[0]) if not out.empty else -1
     print(f"✅ Ingested opportunity peers into {OUT_PARQUET} with method='{out['method'].iloc[0]}', k={k_val}, year={int(out['year'].iloc[0])}")
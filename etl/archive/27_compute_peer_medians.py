@@ -24,15 +24,90 @@ Poznámky:
 
 from __future__ import annotations
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    import numba  # optional
+    from numba import prange
+except Exception:
+    numba = None
+    prange = range
 
 METRICS = Path("data/out/metrics_enriched.parquet")
 PG_STAT = Path("data/out/peer_groups.parquet")
 PG_HUM  = Path("data/out/peer_groups_human.parquet")
 OUT     = Path("data/out/metrics_peer_medians.parquet")
 
-def _require_cols(df: pd.DataFrame, need: set, name: str):
-    miss = need - set(df.columns)
+def _loo_median_kernel(values, starts, ends, loo_out, grp_out):
+    """
+    Pro každou (cluster, hs6) skupinu [starts[g], ends[g]) spočítá medián
+    všech hodnot (grp_out) a pro každý řádek leave-one-out medián bez jeho
+    vlastní hodnoty (loo_out; NaN pokud je ve skupině sám).
+    """
+    for g in prange(starts.shape[0]):
+        s = starts[g]
+        e = ends[g]
+        n = e - s
+        seg = np.sort(values[s:e])
+        if n % 2 == 1:
+            grp_out[g] = seg[n // 2]
+        else:
+            grp_out[g] = 0.5 * (seg[n // 2 - 1] + seg[n // 2])
+        for i in range(s, e):
+            if n == 1:
+                loo_out[i] = np.nan
+                continue
+            # pozice vlastní hodnoty v seřazeném úseku; LOO medián se pak
+            # čte přímo z prostředních prvků s vynechanou pozicí
+            p = np.searchsorted(seg, values[i])
+            m = n - 1
+            if m % 2 == 1:
+                q = m // 2
+                loo_out[i] = seg[q] if q < p else seg[q + 1]
+            else:
+                q1 = m // 2 - 1
+                q2 = m // 2
+                v1 = seg[q1] if q1 < p else seg[q1 + 1]
+                v2 = seg[q2] if q2 < p else seg[q2 + 1]
+                loo_out[i] = 0.5 * (v1 + v2)
+
+
+if numba is not None:
+    _loo_median_kernel = numba.njit(parallel=True, cache=True)(_loo_median_kernel)
+
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    # nízkokardinální stringy drž jako category: groupby/merge pak běží nad
+    # int kódy místo hashování Python stringů a parquet je uloží slovníkově
+    for c in ("iso3", "partner_iso3", "method", "cluster"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+def _read_year(pf: pq.ParquetFile, year: int, columns: list[str] | None = None) -> pd.DataFrame:
+    """Přečte jen row-groupy, jejichž statistiky roku zasahují `year`,
+    z již otevřeného ParquetFile — footer se parsuje jen jednou na soubor."""
+    md = pf.metadata
+    ycol = next(j for j in range(md.num_columns) if md.schema.column(j).name == "year")
+    groups = []
+    for i in range(md.num_row_groups):
+        st = md.row_group(i).column(ycol).statistics
+        if st is None or not st.has_min_max or (st.min <= year <= st.max):
+            groups.append(i)
+    cols = columns if columns is None else list(dict.fromkeys(["year", *columns]))
+    tbl = pf.read_row_groups(groups, columns=cols)
+    tbl = tbl.filter(pc.equal(tbl["year"], year))
+    if columns is not None and "year" not in columns:
+        tbl = tbl.drop_columns(["year"])
+    return tbl.to_pandas()
+
+
+def _require_cols_schema(pf: pq.ParquetFile, need: set, name: str):
+    # kontrola jen nad footerem souboru, bez čtení dat
+    miss = need - set(pf.schema_arrow.names)
     if miss:
         raise ValueError(f"{name} missing columns: {sorted(miss)}")
 
@@ -45,32 +120,49 @@ def _compute_for_pg(cur: pd.DataFrame, pg: pd.DataFrame, method: str, k: int | N
     if pg.empty:
         return pd.DataFrame(columns=["year","hs6","partner_iso3","method","k","median_peer_share","delta_vs_peer"])
 
-    # membership per cluster
-    m = pg[["iso3","cluster"]].dropna().drop_duplicates().copy()
-    # all (target, peer) pairs in the same cluster, excluding self
-    pairs = m.merge(m, on="cluster", suffixes=("_t","_p"))
-    pairs = pairs[pairs["iso3_t"] != pairs["iso3_p"]]
+    # membership per cluster (dropna/drop_duplicates už vrací nový frame)
+    m = pg[["iso3","cluster"]].dropna().drop_duplicates()
 
-    # attach peer shares by hs6
-    peers_shares = pairs.merge(
+    # exact leave-one-out medián přes kompilovaný kernel: seskupíme řádky
+    # podle (cluster, hs6) přes int kódy a spočítáme medián ostatních členů
+    # indexovou aritmetikou nad jednou seřazenou skupinou
+    joined = m.merge(
         cur[["hs6","partner_iso3","podil_cz_na_importu"]],
-        left_on="iso3_p", right_on="partner_iso3", how="left"
-    )
-    peers_shares = peers_shares.dropna(subset=["podil_cz_na_importu"])
+        left_on="iso3", right_on="partner_iso3", how="inner"
+    ).dropna(subset=["podil_cz_na_importu"])
 
-    if peers_shares.empty:
+    if joined.empty:
         return pd.DataFrame(columns=["year","hs6","partner_iso3","method","k","median_peer_share","delta_vs_peer"])
 
-    # median over peers per (target country, hs6)
-    med = (
-        peers_shares
-        .groupby(["iso3_t","hs6"], as_index=False)["podil_cz_na_importu"].median()
-        .rename(columns={"iso3_t":"partner_iso3","podil_cz_na_importu":"median_peer_share"})
-    )
+    cl_codes, _ = pd.factorize(joined["cluster"], sort=False)
+    hs_codes, _ = pd.factorize(joined["hs6"], sort=False)
+    order = np.lexsort((hs_codes, cl_codes))
+    joined = joined.iloc[order].reset_index(drop=True)
+    cl_codes = cl_codes[order]
+    hs_codes = hs_codes[order]
+    values = joined["podil_cz_na_importu"].to_numpy(dtype=np.float64)
+
+    new_grp = np.empty(len(joined), dtype=bool)
+    new_grp[0] = True
+    new_grp[1:] = (cl_codes[1:] != cl_codes[:-1]) | (hs_codes[1:] != hs_codes[:-1])
+    starts = np.flatnonzero(new_grp)
+    ends = np.append(starts[1:], len(joined))
 
-    # join target's own share
-    cur_tgt = cur[["partner_iso3","hs6","podil_cz_na_importu"]].rename(columns={"podil_cz_na_importu":"target_share"})
-    out = med.merge(cur_tgt, on=["partner_iso3","hs6"], how="left")
+    loo = np.empty(len(joined), dtype=np.float64)
+    grp = np.empty(len(starts), dtype=np.float64)
+    _loo_median_kernel(values, starts, ends, loo, grp)
+
+    grp_med = joined.loc[starts, ["cluster","hs6"]].assign(grp_median=grp)
+
+    loo_df = joined[["cluster","hs6","iso3"]].rename(columns={"iso3":"partner_iso3"})
+    loo_df = loo_df.assign(target_share=values, loo_median=loo)
+
+    # členové s vlastní hodnotou dostanou LOO medián; členové bez dat medián
+    # všech hodnot skupiny (= medián jejich peers)
+    out = m.rename(columns={"iso3":"partner_iso3"}).merge(grp_med, on="cluster")
+    out = out.merge(loo_df, on=["cluster","hs6","partner_iso3"], how="left")
+    out["median_peer_share"] = out["loo_median"].where(out["target_share"].notna(), out["grp_median"])
+    out = out.dropna(subset=["median_peer_share"])
 
     # compute delta
     out["delta_vs_peer"] = out["target_share"] - out["median_peer_share"]
@@ -82,44 +174,46 @@ def _compute_for_pg(cur: pd.DataFrame, pg: pd.DataFrame, method: str, k: int | N
 def main():
     if not METRICS.is_file():
         raise FileNotFoundError(f"Missing {METRICS}")
-    df = pd.read_parquet(METRICS)
-    _require_cols(df, {"year","hs6","partner_iso3","podil_cz_na_importu"}, "metrics_enriched")
+    # kontrola sloupců z footeru + dvoufázové čtení nad jedním handle:
+    # nejdřív jen year kvůli maximu, pak potřebné sloupce z row-groupů
+    # vybraných podle statistik v už načteném footeru
+    pf_m = pq.ParquetFile(METRICS)
+    miss = {"year","hs6","partner_iso3","podil_cz_na_importu"} - set(pf_m.schema_arrow.names)
+    if miss:
+        raise ValueError(f"metrics_enriched missing columns: {sorted(miss)}")
 
-    latest_year = int(df["year"].max())
-    cur = df[df["year"] == latest_year][["hs6","partner_iso3","podil_cz_na_importu"]].copy()
+    years = pf_m.read(columns=["year"])["year"]
+    latest_year = int(pc.max(years).as_py())
+    cur = _read_year(pf_m, latest_year, columns=["hs6","partner_iso3","podil_cz_na_importu"])
+    cur = _categorize(cur)
 
     blocks: list[pd.DataFrame] = []
 
     # --- statistical peer groups (matching + opportunity) ---
     if PG_STAT.is_file():
-        pg_all = pd.read_parquet(PG_STAT)
-        _require_cols(pg_all, {"iso3","cluster","method","k","year"}, "peer_groups.parquet")
-        pg_all = pg_all[pg_all["year"] == latest_year].copy()
+        # rok se filtruje už při čtení: statistiky row-group pruní ostatní
+        # roky dřív, než se vůbec dekódují
+        pf_pg = pq.ParquetFile(PG_STAT)
+        _require_cols_schema(pf_pg, {"iso3","cluster","method","k","year"}, "peer_groups.parquet")
+        pg_all = _categorize(_read_year(pf_pg, latest_year))
         if not pg_all.empty:
-            combos = (
-                pg_all[["method","k"]]
-                .drop_duplicates()
-                .sort_values(["method","k"])
-                .to_dict("records")
-            )
-            for c in combos:
-                method = str(c["method"])
-                k = int(c["k"])
-                pg = pg_all[(pg_all["method"] == method) & (pg_all["k"] == k)][["iso3","cluster"]].copy()
-                blk = _compute_for_pg(cur, pg, method=method, k=k, year=latest_year)
+            # jeden groupby rozdá bloky po (method, k) v jednom průchodu
+            # místo opakovaného boolean filtru přes celý frame
+            for (method, k), pg in pg_all.groupby(["method","k"], sort=True, observed=True):
+                blk = _compute_for_pg(cur, pg[["iso3","cluster"]],
+                                      method=str(method), k=int(k), year=latest_year)
                 if not blk.empty:
                     blocks.append(blk)
 
     # --- human peer groups ---
     if PG_HUM.is_file():
-        ph = pd.read_parquet(PG_HUM)
-        _require_cols(ph, {"iso3","cluster","year"}, "peer_groups_human.parquet")
-        ph = ph[ph["year"] == latest_year].copy()
+        pf_ph = pq.ParquetFile(PG_HUM)
+        _require_cols_schema(pf_ph, {"iso3","cluster","year"}, "peer_groups_human.parquet")
+        ph = _categorize(_read_year(pf_ph, latest_year))
         if not ph.empty:
             method = str(ph["method"].iloc[0]) if "method" in ph.columns and pd.notna(ph["method"]).any() else "human_geo_econ_v2"
             k = int(ph["k"].iloc[0]) if "k" in ph.columns and pd.notna(ph["k"]).any() else int(ph["cluster"].nunique())
-            pg = ph[["iso3","cluster"]].copy()
-            blk = _compute_for_pg(cur, pg, method=method, k=k, year=latest_year)
+            blk = _compute_for_pg(cur, ph[["iso3","cluster"]], method=method, k=k, year=latest_year)
             if not blk.empty:
                 blocks.append(blk)
 
@@ -137,7 +231,9 @@ def main():
     assert out["partner_iso3"].astype(str).str.len().eq(3).all()
 
     OUT.parent.mkdir(parents=True, exist_ok=True)
-    out.to_parquet(OUT, index=False)
+    out.to_parquet(OUT, index=False, compression='zstd', compression_level=9,
+                   use_dictionary=['hs6','partner_iso3','method'],
+                   row_group_size=256_000)
     print(f"✅ Wrote {len(out)} rows to {OUT} for year={latest_year} across {out['method'].nunique()} methods.")
 
 if __name__ == "__main__":
@@ -28,7 +28,10 @@ Notes
 
 from __future__ import annotations
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import argparse
 
 P_METRICS   = Path("data/out/metrics_enriched.parquet")
@@ -78,15 +81,36 @@ TYPE_ORDER = [
     "Peer_gap_human",
 ]
 
-def method_to_peer_type(method: str) -> str:
-    m = (method or "").lower()
-    if "opportunity" in m:
-        return "Peer_gap_opportunity"
-    if "hs2_shares" in m or "kmeans_cosine_hs2_shares" in m:
-        return "Peer_gap_matching"
-    if "human" in m:
-        return "Peer_gap_human"
-    return "Peer_gap_below_median"  # not exported
+def method_to_peer_type(method: pd.Series) -> pd.Series:
+    """Classify methods into exported peer-gap types via vectorized string
+    kernels instead of a Python function call per row."""
+    m = method.astype(str).str.lower()
+    typ = pd.Series("Peer_gap_below_median", index=method.index)  # not exported
+    typ = typ.mask(m.str.contains("human", regex=False), "Peer_gap_human")
+    typ = typ.mask(m.str.contains("hs2_shares", regex=False), "Peer_gap_matching")
+    typ = typ.mask(m.str.contains("opportunity", regex=False), "Peer_gap_opportunity")
+    return typ.astype("category")
+
+def _read_year(pf: pq.ParquetFile, year: int, columns: list[str]) -> pd.DataFrame:
+    """Read only the row groups whose cached footer statistics admit `year`
+    from an already-open ParquetFile, so the footer is parsed once per file."""
+    md = pf.metadata
+    ycol = next(j for j in range(md.num_columns) if md.schema.column(j).name == "year")
+    groups = []
+    for i in range(md.num_row_groups):
+        st = md.row_group(i).column(ycol).statistics
+        if st is None or not st.has_min_max or (st.min <= year <= st.max):
+            groups.append(i)
+    tbl = pf.read_row_groups(groups, columns=list(dict.fromkeys(["year", *columns])))
+    return tbl.filter(pc.equal(tbl["year"], year)).select(columns).to_pandas()
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Keep low-cardinality string columns categorical: merges/groupbys run
+    on integer codes and parquet writes them dictionary-encoded."""
+    for c in ("partner_iso3", "method", "type"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
 
 def top_k_per_type(df: pd.DataFrame, k: int) -> pd.DataFrame:
     """Keep top-k by intensity within each (country,type)."""
@@ -108,46 +132,26 @@ def ensure_top_n(filtered: pd.DataFrame, fallback: pd.DataFrame, n: int) -> pd.D
     if filtered.empty and fallback.empty:
         return filtered
 
-    # sort both pools by intensity desc for deterministic head(n)
-    f_sorted = (
-        filtered.sort_values(["country_iso3", "type", "intensity"], ascending=[True, True, False])
+    # one global sort + dedupe + group head replaces the per-(country,type)
+    # Python loop with its anti-join merges: filtered rows rank ahead of
+    # fallback via the priority tag, duplicates of already-selected signals
+    # are dropped, and head(n) fills remaining slots from the fallback
+    pool = pd.concat(
+        [filtered.assign(_prio=0), fallback.assign(_prio=1)],
+        ignore_index=True,
     )
-    fb_sorted = (
-        fallback.sort_values(["country_iso3", "type", "intensity"], ascending=[True, True, False])
+    pool = pool.sort_values(
+        ["country_iso3", "type", "_prio", "intensity"],
+        ascending=[True, True, True, False],
     )
-
-    out_blocks = []
-    # compute desired groups from union of keys present in either frame
-    keys = (
-        pd.concat([
-            f_sorted[["country_iso3", "type"]],
-            fb_sorted[["country_iso3", "type"]]
-        ], ignore_index=True)
-        .drop_duplicates()
-        .itertuples(index=False, name=None)
+    pool = pool.drop_duplicates(["country_iso3", "type", "hs6", "partner_iso3"], keep="first")
+    return (
+        pool.groupby(["country_iso3", "type"], sort=False, as_index=False)
+            .head(n)
+            .drop(columns="_prio")
+            .reset_index(drop=True)
     )
 
-    for country_iso3, typ in keys:
-        f_grp = f_sorted[(f_sorted["country_iso3"] == country_iso3) & (f_sorted["type"] == typ)]
-        need = n - len(f_grp)
-        if need <= 0:
-            out_blocks.append(f_grp.head(n))
-            continue
-        # take from fallback of the same type, excluding already selected (by hs6+partner)
-        fb_grp = fb_sorted[(fb_sorted["country_iso3"] == country_iso3) & (fb_sorted["type"] == typ)].copy()
-        # a simpler duplicate filter using merge anti-join
-        if not f_grp.empty:
-            fb_grp = fb_grp.merge(
-                f_grp[["hs6", "partner_iso3"]].assign(_sel=1),
-                on=["hs6", "partner_iso3"], how="left"
-            )
-            fb_grp = fb_grp[fb_grp["_sel"].isna()].drop(columns=["_sel"])
-        out_blocks.append(pd.concat([f_grp, fb_grp.head(max(0, need))], ignore_index=True))
-
-    if not out_blocks:
-        return filtered
-    return pd.concat(out_blocks, ignore_index=True)
-
 # ---------- main ----------
 def main(top_n: int = 3, fill_under_threshold: bool = False) -> None:
     if not P_METRICS.is_file():
@@ -157,75 +161,64 @@ def main(top_n: int = 3, fill_under_threshold: bool = False) -> None:
 
     th = load_thresholds()
 
-    # Base metrics
-    me = pd.read_parquet(P_METRICS)
-    latest = int(me["year"].max())
-    me = me[me["year"] == latest].copy()
-
-    # S1: YoY export
-    s1 = me.loc[me["YoY_export_change"].notna()].copy()
-    s1 = s1[s1["YoY_export_change"] >= th["S1"]]
-    s1 = s1.assign(
-        country_iso3=s1["partner_iso3"],
-        type="YoY_export_change",
-        value=s1["export_cz_to_partner"],
-        intensity=s1["YoY_export_change"].abs(),
-        method=None, k=None,
-    )[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
-
-    # S2: YoY partner share
-    s2 = me.loc[me["YoY_partner_share_change"].notna()].copy()
-    s2 = s2[s2["YoY_partner_share_change"] >= th["S2"]]
-    s2 = s2.assign(
-        country_iso3=s2["partner_iso3"],
-        type="YoY_partner_share_change",
-        value=s2["export_cz_to_partner"],
-        intensity=s2["YoY_partner_share_change"].abs(),
-        method=None, k=None,
-    )[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
+    # Base metrics: read only the referenced columns, with the year filter
+    # pushed down after a cheap year-column scan for the max; both reads
+    # share one ParquetFile handle so the footer is decoded once
+    me_cols = ["year", "hs6", "partner_iso3", "YoY_export_change",
+               "YoY_partner_share_change", "export_cz_to_partner"]
+    pf_me = pq.ParquetFile(P_METRICS)
+    years = pf_me.read(columns=["year"])["year"]
+    latest = int(pc.max(years).as_py())
+    me = _categorize(_read_year(pf_me, latest, me_cols))
+
+    # S1/S2: build each unfiltered pool once from raw NumPy columns and
+    # derive the thresholded frame with a boolean mask, instead of four
+    # separate assign() passes copying the same columns
+    yoy_e = me["YoY_export_change"].to_numpy(dtype=float)
+    yoy_s = me["YoY_partner_share_change"].to_numpy(dtype=float)
+    val = me["export_cz_to_partner"].to_numpy()
+
+    def _yoy_pool(sig_type: str, yoy: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame({
+            "country_iso3": me["partner_iso3"].values,
+            "year": me["year"].values,
+            "type": sig_type,
+            "hs6": me["hs6"].values,
+            "partner_iso3": me["partner_iso3"].values,
+            "intensity": np.abs(yoy),
+            "value": val,
+            "method": None,
+            "k": None,
+        })
+
+    s1_all = _yoy_pool("YoY_export_change", yoy_e)
+    s2_all = _yoy_pool("YoY_partner_share_change", yoy_s)
+    # NaN compares False, so the notna() filter is implied by the mask
+    s1 = s1_all[yoy_e >= th["S1"]]
+    s2 = s2_all[yoy_s >= th["S2"]]
+
+    # Peer gaps (use precomputed medians for all methods incl. human);
+    # one decode of the medians file feeds both the thresholded pool and
+    # the unfiltered fallback pool
+    pm_cols = ["year", "hs6", "partner_iso3", "method", "k", "delta_vs_peer"]
+    pm_raw = _categorize(_read_year(pq.ParquetFile(P_MEDIANS), latest, pm_cols))
+    pm_raw = pm_raw.assign(
+        type=method_to_peer_type(pm_raw["method"]),
+        intensity=pm_raw["delta_vs_peer"] * -1.0,  # negative gap -> positive intensity
+    )
+    pm_raw = pm_raw[pm_raw["type"].isin(TYPE_ORDER)]  # keep only the three we expose
+    pm = pm_raw[pm_raw["intensity"] >= abs(th["PEER_GAP"])]
 
-    # Peer gaps (use precomputed medians for all methods incl. human)
-    pm = pd.read_parquet(P_MEDIANS)
-    pm = pm[pm["year"] == latest].copy()
-    pm["type"] = pm["method"].map(method_to_peer_type)
-    pm = pm[pm["type"].isin(TYPE_ORDER)]  # keep only the three we expose
-    pm["intensity"] = (pm["delta_vs_peer"] * -1.0)  # negative gap -> positive intensity
-    pm = pm[pm["intensity"] >= abs(th["PEER_GAP"])]
-
-
-    # standardize columns (keep both partner_iso3 and country_iso3)
-    pkeep = pm.copy()
-    pkeep["country_iso3"] = pkeep["partner_iso3"]
-    pkeep["value"] = pkeep["delta_vs_peer"]
-    pkeep = pkeep[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
-
-    # Unfiltered pools (for optional fill):
-    s1_all = me.assign(
-        country_iso3=me["partner_iso3"],
-        type="YoY_export_change",
-        value=me["export_cz_to_partner"],
-        intensity=me["YoY_export_change"].abs(),
-        method=None, k=None,
+    # standardize columns (keep both partner_iso3 and country_iso3);
+    # assign() returns a fresh frame, no defensive copy needed
+    pkeep = pm.assign(
+        country_iso3=pm["partner_iso3"], value=pm["delta_vs_peer"],
     )[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
 
-    s2_all = me.assign(
-        country_iso3=me["partner_iso3"],
-        type="YoY_partner_share_change",
-        value=me["export_cz_to_partner"],
-        intensity=me["YoY_partner_share_change"].abs(),
-        method=None, k=None,
+    pkeep_all = pm_raw.assign(
+        country_iso3=pm_raw["partner_iso3"], value=pm_raw["delta_vs_peer"],
     )[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
 
-    pm_all = pd.read_parquet(P_MEDIANS)
-    pm_all = pm_all[pm_all["year"] == latest].copy()
-    pm_all["type"] = pm_all["method"].map(method_to_peer_type)
-    pm_all = pm_all[pm_all["type"].isin(TYPE_ORDER)]
-    pm_all["intensity"] = (pm_all["delta_vs_peer"] * -1.0)
-    pkeep_all = pm_all.copy()
-    pkeep_all["country_iso3"] = pkeep_all["partner_iso3"]
-    pkeep_all["value"] = pkeep_all["delta_vs_peer"]
-    pkeep_all = pkeep_all[["country_iso3","year","type","hs6","partner_iso3","intensity","value","method","k"]]
-
     # Combine filtered and (optionally) fallback pools
     filtered_rows = pd.concat([s1, s2, pkeep], ignore_index=True)
     if fill_under_threshold:
@@ -235,7 +228,9 @@ def main(top_n: int = 3, fill_under_threshold: bool = False) -> None:
       top = top_k_per_type(filtered_rows, top_n)
 
     P_OUT.parent.mkdir(parents=True, exist_ok=True)
-    top.to_parquet(P_OUT, index=False)
+    top.to_parquet(P_OUT, index=False, compression='zstd', compression_level=9,
+                   use_dictionary=['country_iso3','type','hs6','partner_iso3','method'],
+                   row_group_size=256_000)
     print(f"✅ Wrote TOP signals to {P_OUT} | rows={len(top)} | latest_year={latest} | N={top_n} per type")
 
 if __name__ == "__main__":
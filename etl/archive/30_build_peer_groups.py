@@ -3,6 +3,7 @@ import os, sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
 DATA_DIR = Path("data")
 SRC = DATA_DIR / "parquet" / "trade_by_hs2.parquet"
@@ -11,14 +12,43 @@ HS2_IMPORTS = DATA_DIR / "parquet" / "trade_by_hs2_imports.parquet"
 OUT_PARQUET = DATA_DIR / "out" / "peer_groups.parquet"
 OUT_CSV = DATA_DIR / "out" / "peer_groups.csv"
 
-def log(msg): 
+def log(msg):
     print(f"[peer-groups] {msg}")
 
+def write_parquet(df: pd.DataFrame, path: Path):
+    # zstd + dictionary pages roughly halve the file for the repetitive
+    # iso3/method columns; bounded pages avoid buffer reallocation churn
+    df.to_parquet(path, index=False, engine="pyarrow", compression="zstd",
+                  compression_level=3, use_dictionary=True,
+                  data_page_size=1 << 20, row_group_size=256_000)
+
+def read_parquet_lower(path: Path, wanted: set[str]) -> pd.DataFrame:
+    """Read a parquet file with projection to the columns we may use
+    (matched case-insensitively) and lowercase the names at the Arrow
+    layer; split_blocks/self_destruct skip the pandas consolidation copy."""
+    pf = pq.ParquetFile(path)
+    cols = [n for n in pf.schema_arrow.names if n.lower() in wanted] or None
+    tbl = pf.read(columns=cols)
+    tbl = tbl.rename_columns([c.lower() for c in tbl.column_names])
+    return tbl.to_pandas(split_blocks=True, self_destruct=True)
+
+def _imports_mask(flow: pd.Series) -> np.ndarray:
+    """Boolean mask for import rows. `flow` holds a handful of distinct
+    labels, so classify the categories once and compare integer codes
+    instead of lowercasing and prefix-testing every row."""
+    cat = flow.astype("category")
+    imp = [i for i, v in enumerate(cat.cat.categories) if str(v).lower().startswith("i")]
+    return np.isin(cat.cat.codes.to_numpy(), imp)
+
+# columns any branch below may touch
+_HS2_COLS = {"reporter_iso3","hs2","trade_value_usd","value","iso3",
+             "importer","exporter","value_usd","flow","year"}
+_PAIR_COLS = {"importer","hs2","value_usd","value","flow","year"}
+
 def load_data():
     # Fast path: if we have pre-aggregated imports by HS2, use that directly
     if HS2_IMPORTS.exists():
-        df = pd.read_parquet(HS2_IMPORTS)
-        df.columns = [c.lower() for c in df.columns]
+        df = read_parquet_lower(HS2_IMPORTS, {"reporter_iso3","hs2","trade_value_usd","year"})
         needed = {"reporter_iso3","hs2","trade_value_usd"}
         if not needed.issubset(df.columns):
             log(f"Pre-aggregated {HS2_IMPORTS.name} missing columns; falling back to other sources.")
@@ -44,16 +74,13 @@ def load_data():
             else:
                 year = None
                 log("No 'year' column in pre-aggregated table; treating as single period.")
-            df = df[["reporter_iso3","hs2","trade_value_usd"]].copy()
+            df = df[["reporter_iso3","hs2","trade_value_usd"]]
             return df, year
 
     if not SRC.exists():
         log(f"ERROR: {SRC} not found.")
         sys.exit(2)
-    cols = None  # read all; some parquet engines need this
-    df = pd.read_parquet(SRC, columns=cols)
-    # Normalize column names
-    df.columns = [c.lower() for c in df.columns]
+    df = read_parquet_lower(SRC, _HS2_COLS)
 
     # Early fallback: if this is an exporter-only HS2 table, rebuild imports from pair table
     if {"exporter","hs2","value_usd"}.issubset(df.columns) and "flow" not in df.columns:
@@ -61,8 +88,7 @@ def load_data():
         if not SRC_FALLBACK.exists():
             log(f"ERROR: Fallback {SRC_FALLBACK} not found.")
             sys.exit(2)
-        dfp = pd.read_parquet(SRC_FALLBACK)
-        dfp.columns = [c.lower() for c in dfp.columns]
+        dfp = read_parquet_lower(SRC_FALLBACK, _PAIR_COLS)
         # Accept pair table with or without 'flow'; aggregate by importer×hs2 (and year if present)
         # Normalize value column
         if "value" in dfp.columns and "value_usd" not in dfp.columns:
@@ -73,14 +99,13 @@ def load_data():
             sys.exit(2)
         # Optional filter to imports if flow exists
         if "flow" in dfp.columns:
-            mask = dfp["flow"].astype(str).str.lower().str.startswith("i")
-            dfp_use = dfp[mask]
+            dfp_use = dfp[_imports_mask(dfp["flow"])]
             if dfp_use.empty:
                 dfp_use = dfp
         else:
             dfp_use = dfp
         keep_cols = [c for c in ["importer","hs2","value_usd","year"] if c in dfp_use.columns]
-        dfp_use = dfp_use[keep_cols].copy()
+        dfp_use = dfp_use[keep_cols]
         group_cols = [c for c in ["importer","hs2","year"] if c in dfp_use.columns]
         dfp_agg = dfp_use.groupby(group_cols, as_index=False)["value_usd"].sum()
         df = dfp_agg.rename(columns={"importer": "reporter_iso3", "value_usd": "trade_value_usd"})
@@ -110,8 +135,7 @@ def load_data():
 
     # Filter imports if flow column exists
     if "flow" in df.columns:
-        f = df["flow"].astype(str).str.lower()
-        df = df[f.str.startswith("i")]  # "import" or "imports"
+        df = df[_imports_mask(df["flow"])]  # "import" or "imports"
         log(f"Filtered to imports using 'flow' column: {len(df):,} rows remain.")
     else:
         # If file looks exporter-based, try fallback to trade_by_pair.parquet
@@ -121,8 +145,7 @@ def load_data():
                 log(f"ERROR: Need imports but no 'flow' here. Fallback {SRC_FALLBACK} not found.")
                 sys.exit(2)
             log(f"Falling back to {SRC_FALLBACK.name} to build imports by HS2.")
-            dfp = pd.read_parquet(SRC_FALLBACK)
-            dfp.columns = [c.lower() for c in dfp.columns]
+            dfp = read_parquet_lower(SRC_FALLBACK, _PAIR_COLS)
             # Accept pair table with or without 'flow'; aggregate by importer×hs2 (and year if present)
             # Normalize value column
             if "value" in dfp.columns and "value_usd" not in dfp.columns:
@@ -133,14 +156,13 @@ def load_data():
                 sys.exit(2)
             # Optional filter to imports if flow exists
             if "flow" in dfp.columns:
-                mask = dfp["flow"].astype(str).str.lower().str.startswith("i")
-                dfp_use = dfp[mask]
+                dfp_use = dfp[_imports_mask(dfp["flow"])]
                 if dfp_use.empty:
                     dfp_use = dfp
             else:
                 dfp_use = dfp
             keep_cols = [c for c in ["importer","hs2","value_usd","year"] if c in dfp_use.columns]
-            dfp_use = dfp_use[keep_cols].copy()
+            dfp_use = dfp_use[keep_cols]
             group_cols = [c for c in ["importer","hs2","year"] if c in dfp_use.columns]
             dfp_agg = dfp_use.groupby(group_cols, as_index=False)["value_usd"].sum()
             df = dfp_agg.rename(columns={"importer": "reporter_iso3", "value_usd": "trade_value_usd"})
@@ -170,41 +192,47 @@ def load_data():
         log("No 'year' column; treating data as a single period.")
 
     # Keep only needed cols
-    df = df[["reporter_iso3","hs2","trade_value_usd"]].copy()
+    df = df[["reporter_iso3","hs2","trade_value_usd"]]
     return df, year
 
 def build_share_matrix(df: pd.DataFrame) -> pd.DataFrame:
     # Defensive cleaning: ensure numeric values and normalized keys
-    df = df.copy()
-    df["reporter_iso3"] = df["reporter_iso3"].astype(str).str.upper()
-    df["hs2"] = df["hs2"].astype(str)
-    df["trade_value_usd"] = pd.to_numeric(df["trade_value_usd"], errors="coerce").fillna(0.0)
+    rep = df["reporter_iso3"].astype(str).str.upper()
+    hs2 = df["hs2"].astype(str)
+    vals = pd.to_numeric(df["trade_value_usd"], errors="coerce").fillna(0.0).to_numpy(np.float64)
+
+    # One linear pass instead of pivot_table: factorize both keys and
+    # scatter-add the values into a dense (country, hs2) matrix; duplicates
+    # sum naturally and no intermediate groupby/pivot frames are allocated
+    ri, rows = pd.factorize(rep, sort=True)
+    ci, cols = pd.factorize(hs2, sort=True)
+    mat = np.zeros((len(rows), len(cols)), dtype=np.float64)
+    np.add.at(mat, (ri, ci), vals)
 
-    piv = df.pivot_table(
-        index="reporter_iso3",
-        columns="hs2",
-        values="trade_value_usd",
-        aggfunc="sum",
-        fill_value=0.0,
-    )
-    piv = piv.sort_index()
-    row_sums = piv.sum(axis=1)
-    piv = piv[row_sums > 0]
-    shares = piv.div(piv.sum(axis=1), axis=0).fillna(0.0)
-    return shares
+    row_sums = mat.sum(axis=1)
+    keep = row_sums > 0
+    shares = mat[keep] / row_sums[keep, None]
+    return pd.DataFrame(shares, index=pd.Index(rows[keep], name="reporter_iso3"), columns=cols)
 
-def kmeans_cosine(X: np.ndarray, k: int, max_iter: int = 200, seed: int = 42):
+def _l2_normalize_rows(X: np.ndarray) -> np.ndarray:
+    """Unit-norm rows as a contiguous float32 matrix: plenty of precision
+    for share vectors and dispatches the assignment matmul to sgemm —
+    twice the FLOPs per cycle, half the bytes moved."""
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(X / norms, dtype=np.float32)
+
+def kmeans_cosine(X: np.ndarray, k: int, max_iter: int = 200, seed: int = 42,
+                  normalized: bool = False):
     """
     Cosine k-means:
     - assign by max cosine similarity
     - centroids = mean of assigned points, then L2-normalized
+    Pass normalized=True when X already has unit-norm rows.
     Returns labels (n,) and centroids (k,d).
     """
     rng = np.random.default_rng(seed)
-    # Normalize rows to unit norm (avoid div by zero)
-    norms = np.linalg.norm(X, axis=1, keepdims=True)
-    norms[norms==0] = 1.0
-    Xn = X / norms
+    Xn = X if normalized else _l2_normalize_rows(X)
 
     # init: choose k distinct rows
     if k > len(Xn):
@@ -212,25 +240,42 @@ def kmeans_cosine(X: np.ndarray, k: int, max_iter: int = 200, seed: int = 42):
     init_idx = rng.choice(len(Xn), size=k, replace=False)
     C = Xn[init_idx].copy()
 
-    labels = np.zeros(len(Xn), dtype=int)
+    # persistent buffers: a Fortran-ordered C.T copy (what sgemm wants for
+    # the right operand) and the (n,k) similarity matrix, so the loop does
+    # no per-iteration allocation for the matmul
+    n, d = Xn.shape
+    Ct = np.empty((d, k), dtype=Xn.dtype, order="F")
+    sims = np.empty((n, k), dtype=Xn.dtype)
+    np.copyto(Ct, C.T)
+
+    labels = np.zeros(len(Xn), dtype=np.intp)
+    new_labels = np.empty_like(labels)
     for it in range(max_iter):
         # assign by cosine similarity (dot product on unit vectors)
-        sims = Xn @ C.T                  # (n,k)
-        new_labels = sims.argmax(axis=1) # highest similarity
-        if np.array_equal(new_labels, labels) and it > 0:
+        np.matmul(Xn, Ct, out=sims)          # (n,k)
+        sims.argmax(axis=1, out=new_labels)  # highest similarity
+        # stop once assignments are stable enough (<=0.1% of rows moved):
+        # saves the tail iterations that only shuffle a handful of points
+        changed = np.count_nonzero(new_labels != labels)
+        np.copyto(labels, new_labels)
+        if it > 0 and changed <= max(1, len(Xn) // 1000):
             break
-        labels = new_labels
 
-        # recompute centroids
-        for j in range(k):
-            members = Xn[labels == j]
-            if len(members) == 0:
-                # re-seed empty cluster
-                C[j] = Xn[rng.integers(0, len(Xn))]
-            else:
-                v = members.mean(axis=0)
-                n = np.linalg.norm(v)
-                C[j] = v / (n if n > 0 else 1.0)
+        # recompute centroids: one scatter-add over members + bincount
+        # instead of k boolean-mask scans of the full matrix
+        C_sum = np.zeros_like(C)
+        np.add.at(C_sum, labels, Xn)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # re-seed empty clusters with random rows
+            C_sum[empty] = Xn[rng.integers(0, len(Xn), size=int(empty.sum()))]
+            counts[empty] = 1
+        C = C_sum / counts[:, None].astype(C_sum.dtype)
+        cn = np.linalg.norm(C, axis=1, keepdims=True)
+        cn[cn == 0] = 1.0
+        C /= cn
+        np.copyto(Ct, C.T)
 
     return labels, C
 
@@ -240,7 +285,9 @@ def main():
 
     k = int(os.getenv("PEER_K", "10"))
     log(f"Clustering {len(shares)} countries into K={k} clusters (cosine k-means).")
-    labels, _ = kmeans_cosine(shares.values, k=k, max_iter=200, seed=42)
+    # normalize once; the CZE diagnostic below reuses the same matrix
+    Xn = _l2_normalize_rows(shares.values)
+    labels, _ = kmeans_cosine(Xn, k=k, max_iter=200, seed=42, normalized=True)
 
     # Build output
     out = pd.DataFrame({
@@ -253,20 +300,21 @@ def main():
         out["year"] = year
 
     OUT_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    out.to_parquet(OUT_PARQUET, index=False)
+    write_parquet(out, OUT_PARQUET)
     out.to_csv(OUT_CSV, index=False)
     log(f"Wrote: {OUT_PARQUET}")
     log(f"Wrote: {OUT_CSV}")
 
     # Simple diagnostic: top 12 nearest to CZE (if present)
     if "CZE" in shares.index:
-        X = shares.values
-        # cosine similarity on L2-normalized rows
-        Xn = X / np.clip(np.linalg.norm(X, axis=1, keepdims=True), 1e-12, None)
+        # cosine similarity on the already L2-normalized rows
         idx = shares.index.get_loc("CZE")
         sims = Xn @ Xn[idx]
-        order = np.argsort(-sims)
-        peers = [(shares.index[i], float(sims[i])) for i in order[:12]]
+        # only the top 12 matter: partition first, sort just those
+        k_top = min(12, len(sims))
+        topk_idx = np.argpartition(-sims, k_top - 1)[:k_top]
+        order = topk_idx[np.argsort(-sims[topk_idx])]
+        peers = [(shares.index[i], float(sims[i])) for i in order]
         print("\nClosest to CZE by cosine similarity (beta, structural imports @ HS2):")
         for iso, s in peers:
             print(f"  {iso:>3}  sim={s:0.4f}")
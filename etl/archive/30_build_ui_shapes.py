@@ -3,10 +3,25 @@ import pandas as pd
 import pycountry
 import json
 
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
+
 INPUT = "data/out/metrics.parquet"
 OUTPUT = "data/out/ui_shapes"
 os.makedirs(OUTPUT, exist_ok=True)
 
+
+def write_json(path, payload):
+    """Write a JSON-serializable payload, via orjson when available."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(payload, f)
+
 df = pd.read_parquet(INPUT)
 
 # Controls
@@ -19,23 +34,21 @@ metrics_list = [
     "YoY_partner_share_change"
 ]
 controls = {"countries": countries, "years": years, "metrics": metrics_list}
-with open(os.path.join(OUTPUT, "controls.json"), "w") as f:
-    json.dump(controls, f)
+write_json(os.path.join(OUTPUT, "controls.json"), controls)
 
 # Map: for a selected metric and year+hs6, but we demo with 'podil_cz_na_importu' for year=2023
 sel_year = years[-1]
 metric = metrics_list[0]
 sub = df[df["year"] == sel_year][["partner_iso3", metric]].dropna().copy()
 
-# Add country names
-def iso3_to_name(code):
-    country = pycountry.countries.get(alpha_3=code)
-    return country.name if country else code
-sub = sub.assign(name=sub["partner_iso3"].apply(iso3_to_name))
+# Add country names via one precomputed dict map instead of a pycountry
+# lookup call per row
+name_map = {c.alpha_3: c.name for c in pycountry.countries}
+sub = sub.assign(name=sub["partner_iso3"].map(name_map).fillna(sub["partner_iso3"]))
 
 world_map = sub.rename(columns={"partner_iso3": "iso3", metric: "value"})\
     [["iso3","name","value"]]
-world_map.to_json(os.path.join(OUTPUT, "world_map.json"), orient="records")
+write_json(os.path.join(OUTPUT, "world_map.json"), world_map.to_dict(orient="records"))
 
 # Product bars: top 10 products by export for that year
 prod = df[df["year"] == sel_year]
@@ -57,7 +70,7 @@ except Exception:
     # On any failure, fallback to HS6 code labels
     bars["name"] = bars["id"]
 
-bars.to_json(os.path.join(OUTPUT, "product_bars.json"), orient="records")
+write_json(os.path.join(OUTPUT, "product_bars.json"), bars.to_dict(orient="records"))
 
 # Trend mini: for one hs6 = bars[0], aggregated across partners (one point per year)
 trend_hs6 = bars.loc[0, "id"]
@@ -67,7 +80,7 @@ trend = (
       .rename(columns={"export_cz_to_partner": "value"})
       .sort_values("year")
 )
-trend.to_json(os.path.join(OUTPUT, "trend_mini.json"), orient="records")
+write_json(os.path.join(OUTPUT, "trend_mini.json"), trend.to_dict(orient="records"))
 
 print("[PASS] UI shapes written to data/out/ui_shapes/")
 print("Sample controls:", controls)
@@ -15,12 +15,48 @@ Output:
 
 from __future__ import annotations
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+try:
+    import numba  # optional
+    from numba import prange
+except Exception:
+    numba = None
+    prange = range
+
+def write_parquet(df: pd.DataFrame, path: Path) -> None:
+    """Parquet write tuned for the repetitive key columns: zstd with
+    dictionary pages and bounded page/row-group sizes."""
+    df.to_parquet(path, index=False, engine="pyarrow", compression="zstd",
+                  compression_level=3, use_dictionary=True,
+                  data_page_size=1 << 20, row_group_size=256_000)
+
+
 HUMAN_PG = Path("data/out/peer_groups_human.parquet")
 ENRICHED = Path("data/out/metrics_enriched.parquet")
 OUT_PATH = Path("data/out/human_peer_medians.parquet")
 
+
+def _group_median_kernel(values, starts, ends, out):
+    """Median per [starts[g], ends[g]) segment of `values`; NaNs are skipped
+    like pandas' groupby median (all-NaN group -> NaN)."""
+    for g in prange(starts.shape[0]):
+        seg = np.sort(values[starts[g]:ends[g]])  # NaNs sort last
+        m = seg.shape[0]
+        while m > 0 and np.isnan(seg[m - 1]):
+            m -= 1
+        if m == 0:
+            out[g] = np.nan
+        elif m % 2 == 1:
+            out[g] = seg[m // 2]
+        else:
+            out[g] = 0.5 * (seg[m // 2 - 1] + seg[m // 2])
+
+
+if numba is not None:
+    _group_median_kernel = numba.njit(parallel=True, cache=True)(_group_median_kernel)
+
 def main(latest_year: int = 2023) -> None:
     if not HUMAN_PG.is_file():
         raise FileNotFoundError(f"Missing {HUMAN_PG}")
@@ -49,49 +85,73 @@ def main(latest_year: int = 2023) -> None:
     if df.empty:
         raise ValueError(f"No rows for year {latest_year} in {ENRICHED}")
 
-    # For each target country, find its peers from the same human cluster (excluding itself),
-    # then compute median of podil_cz_na_importu across those peers per HS6.
-    # Build a mapping: country_iso3 -> list of peer iso3
-    clusters = pg.groupby("cluster")["iso3"].apply(list).to_dict()
-
-    # Reverse index: country -> cluster
-    country_to_cluster = pg.set_index("iso3")["cluster"].to_dict()
-
-    out_blocks = []
-    # Iterate over all countries that appear in metrics for this year
-    countries = df["partner_iso3"].dropna().unique().tolist()
-    for c in countries:
-        cluster = country_to_cluster.get(c)
-        if cluster is None:
-            # Country not present in human peers for this year -> skip
-            continue
-        peers = [x for x in clusters.get(cluster, []) if x != c]
-        if not peers:
-            continue
-        peers_df = df[df["partner_iso3"].isin(peers)][["hs6","podil_cz_na_importu"]].copy()
-        if peers_df.empty:
-            continue
-        med = peers_df.groupby("hs6", as_index=False)["podil_cz_na_importu"].median()
-        med = med.rename({"podil_cz_na_importu": "median_peer_share_human"}, axis=1)
-        med["country_iso3"] = c
-        med["year"] = latest_year
-        out_blocks.append(med)
-
-    if not out_blocks:
+    # Low-cardinality string keys as categoricals: the joins and the final
+    # groupby then work on int codes instead of hashing strings. Every
+    # groupby over these columns must pass observed=True to stay off the
+    # categorical cross-product path. Sharing one category set between the
+    # two sides keeps the merge on the fast code path.
+    iso_cat = pd.api.types.union_categoricals([
+        pd.Categorical(df["partner_iso3"]), pd.Categorical(pg["iso3"])
+    ]).categories
+    df["partner_iso3"] = pd.Categorical(df["partner_iso3"], categories=iso_cat)
+    pg["iso3"] = pd.Categorical(pg["iso3"], categories=iso_cat)
+    df["hs6"] = df["hs6"].astype("category")
+
+    # Peers come from one cluster self-join instead of a Python loop per
+    # target country: pair each country with its cluster-mates, drop the
+    # self-pairs, attach the peers' metric rows and take a single grouped
+    # median over (target, hs6).
+    members = pg[["iso3","cluster"]].drop_duplicates()
+    peers = members.rename(columns={"iso3": "peer_iso3"})
+    membership = members.merge(peers, on="cluster")
+    membership = membership[membership["iso3"] != membership["peer_iso3"]]
+    # keep only targets that actually appear in metrics for this year,
+    # matching the old per-country iteration
+    membership = membership[membership["iso3"].isin(df["partner_iso3"].dropna().unique())]
+
+    joined = membership.merge(
+        df[["partner_iso3","hs6","podil_cz_na_importu"]],
+        left_on="peer_iso3", right_on="partner_iso3",
+    )
+    # Grouped median through a compiled kernel (numba when available, plain
+    # NumPy otherwise): combine the categorical codes of (target, hs6) into
+    # one group key, sort once, and take each group's median over its
+    # contiguous segment — no pandas median dispatch per group.
+    if joined.empty:
+        out = pd.DataFrame(columns=["country_iso3","hs6","year","median_peer_share_human"])
+    else:
+        tg = joined["iso3"].cat.codes.to_numpy(np.int64)
+        hs = joined["hs6"].cat.codes.to_numpy(np.int64)
+        grp = tg * (hs.max() + 1) + hs
+        order = np.argsort(grp, kind="stable")
+        grp_sorted = grp[order]
+        vals_sorted = joined["podil_cz_na_importu"].to_numpy(np.float64)[order]
+        starts = np.flatnonzero(np.diff(grp_sorted, prepend=grp_sorted[0] - 1))
+        ends = np.append(starts[1:], len(grp_sorted))
+        med = np.empty(len(starts), dtype=np.float64)
+        _group_median_kernel(vals_sorted, starts, ends, med)
+        first = order[starts]
+        out = pd.DataFrame({
+            "country_iso3": joined["iso3"].to_numpy()[first],
+            "hs6": joined["hs6"].to_numpy()[first],
+            "year": latest_year,
+            "median_peer_share_human": med,
+        })
+
+    if out.empty:
         # produce an empty file with the right schema, for predictable downstream behavior
         empty = pd.DataFrame(columns=["country_iso3","hs6","year","median_peer_share_human"])
-        empty.to_parquet(OUT_PATH, index=False)
+        write_parquet(empty, OUT_PATH)
         print(f"⚠️ No medians computed. Wrote empty schema to {OUT_PATH}")
         return
 
-    out = pd.concat(out_blocks, ignore_index=True)
     # Final sanity
     assert out["country_iso3"].str.len().eq(3).all()
     assert out["hs6"].astype(str).str.len().ge(1).all()
     assert out["year"].eq(latest_year).all()
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    out.to_parquet(OUT_PATH, index=False)
+    write_parquet(out, OUT_PATH)
     print(f"✅ Wrote {len(out)} rows to {OUT_PATH}")
 
 if __name__ == "__main__":
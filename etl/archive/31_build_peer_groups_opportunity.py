@@ -3,6 +3,7 @@ import os, sys
 from pathlib import Path
 import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
 DATA_DIR = Path("data")
 PAIR = DATA_DIR / "parquet" / "trade_by_pair.parquet"
@@ -13,17 +14,36 @@ FEAT_CSV = DATA_DIR / "out" / "peer_features_opportunity.csv"
 
 def log(msg): print(f"[peer-opp] {msg}")
 
+def write_parquet(df: pd.DataFrame, path: Path):
+    # zstd + dictionary encoding for the repeated iso/method strings
+    df.to_parquet(path, index=False, engine="pyarrow", compression="zstd",
+                  compression_level=3, use_dictionary=True,
+                  data_page_size=1 << 20, row_group_size=256_000)
+
 # --- math helpers ---
 def safe_div(a, b, eps=1e-12):
     return a / np.clip(b, eps, None)
 
-def truncated_svd(X: np.ndarray, n_components: int):
-    # center columns, then SVD and take top components
+def truncated_svd(X: np.ndarray, n_components: int, seed: int = 42):
+    # center columns, then randomized SVD: project onto a small random
+    # range with a few power iterations and decompose only the projected
+    # matrix — we keep ~40 components of a ~500-wide matrix, so the full
+    # np.linalg.svd wastes most of its work
     X = X.astype(float, copy=False)
     col_mean = X.mean(axis=0, keepdims=True)
     Xc = X - col_mean
-    U, S, Vt = np.linalg.svd(Xc, full_matrices=False)
-    k = max(1, min(n_components, min(U.shape[1], Vt.shape[0])))
+    k = max(1, min(n_components, min(Xc.shape)))
+    p = k + 10  # oversampling for accuracy
+    if p >= min(Xc.shape):
+        # too small for the sketch to pay off; exact SVD
+        U, S, Vt = np.linalg.svd(Xc, full_matrices=False)
+        return U[:, :k] * S[:k], S[:k], Vt[:k, :], col_mean
+    rng = np.random.default_rng(seed)
+    Q = np.linalg.qr(Xc @ rng.standard_normal((Xc.shape[1], p)))[0]
+    for _ in range(5):  # power iterations sharpen the spectrum
+        Q = np.linalg.qr(Xc @ (Xc.T @ Q))[0]
+    Ub, S, Vt = np.linalg.svd(Q.T @ Xc, full_matrices=False)
+    U = Q @ Ub
     return U[:, :k] * S[:k], S[:k], Vt[:k, :], col_mean
 
 def kmeans_cosine(X: np.ndarray, k: int, max_iter: int = 200, seed: int = 42):
@@ -31,25 +51,40 @@ def kmeans_cosine(X: np.ndarray, k: int, max_iter: int = 200, seed: int = 42):
     # L2-normalize rows
     norms = np.linalg.norm(X, axis=1, keepdims=True)
     norms[norms == 0] = 1.0
-    Xn = X / norms
+    # float32 sgemm for the assignment matmul; precision is ample here
+    Xn = np.ascontiguousarray(X / norms, dtype=np.float32)
     if k > len(Xn):
         raise ValueError(f"k={k} > number of rows={len(Xn)}")
     C = Xn[rng.choice(len(Xn), size=k, replace=False)].copy()
-    labels = np.zeros(len(Xn), dtype=int)
+    # persistent Fortran-ordered C.T and (n,k) similarity buffers: the
+    # assignment matmul then runs allocation-free every iteration
+    n, d = Xn.shape
+    Ct = np.empty((d, k), dtype=Xn.dtype, order="F")
+    sims = np.empty((n, k), dtype=Xn.dtype)
+    np.copyto(Ct, C.T)
+    labels = np.zeros(len(Xn), dtype=np.intp)
+    new_labels = np.empty_like(labels)
     for it in range(max_iter):
-        sims = Xn @ C.T
-        new_labels = sims.argmax(axis=1)
-        if it > 0 and np.array_equal(new_labels, labels):
+        np.matmul(Xn, Ct, out=sims)
+        sims.argmax(axis=1, out=new_labels)
+        # stable-enough early stop: <=0.1% of rows changed assignment
+        changed = np.count_nonzero(new_labels != labels)
+        np.copyto(labels, new_labels)
+        if it > 0 and changed <= max(1, len(Xn) // 1000):
             break
-        labels = new_labels
-        for j in range(k):
-            members = Xn[labels == j]
-            if len(members) == 0:
-                C[j] = Xn[rng.integers(0, len(Xn))]
-            else:
-                v = members.mean(axis=0)
-                n = np.linalg.norm(v)
-                C[j] = v / (n if n > 0 else 1.0)
+        # scatter-add centroid update, no per-cluster boolean scans
+        C_sum = np.zeros_like(C)
+        np.add.at(C_sum, labels, Xn)
+        counts = np.bincount(labels, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            C_sum[empty] = Xn[rng.integers(0, len(Xn), size=int(empty.sum()))]
+            counts[empty] = 1
+        C = C_sum / counts[:, None].astype(C_sum.dtype)
+        cn = np.linalg.norm(C, axis=1, keepdims=True)
+        cn[cn == 0] = 1.0
+        C /= cn
+        np.copyto(Ct, C.T)
     return labels, C
 
 # --- data loading ---
@@ -57,8 +92,16 @@ def load_pair(year: int | None, window: int = 4) -> tuple[pd.DataFrame, int]:
     if not PAIR.exists():
         log(f"ERROR: {PAIR} not found.")
         sys.exit(2)
-    df = pd.read_parquet(PAIR)
-    df.columns = [c.lower() for c in df.columns]
+    # project only the columns we may use (incl. BACI short names) and
+    # lowercase at the Arrow layer; split_blocks/self_destruct skip the
+    # pandas block-consolidation copy
+    pf = pq.ParquetFile(PAIR)
+    wanted = {"year","exporter","importer","hs6","value_usd",
+              "i","j","k","t","v","value"}
+    cols = [n for n in pf.schema_arrow.names if n.lower() in wanted] or None
+    tbl = pf.read(columns=cols)
+    tbl = tbl.rename_columns([c.lower() for c in tbl.column_names])
+    df = tbl.to_pandas(split_blocks=True, self_destruct=True)
     # normalize names from BACI (i,j,k,t,v) if present
     ren = {}
     if "i" in df.columns: ren["i"] = "exporter"
@@ -73,19 +116,22 @@ def load_pair(year: int | None, window: int = 4) -> tuple[pd.DataFrame, int]:
         log(f"ERROR: pair table missing columns. Need {needed}, got {set(df.columns)}")
         sys.exit(2)
 
-    # types
-    df["year"] = pd.to_numeric(df["year"], errors="coerce").astype("Int64")
-    df = df.dropna(subset=["year"]).copy()
-    df["year"] = df["year"].astype(int)
-    df["exporter"] = df["exporter"].astype(str)
-    df["importer"] = df["importer"].astype(str)
-    df["hs6"] = df["hs6"].astype(str)
-    df["value_usd"] = pd.to_numeric(df["value_usd"], errors="coerce").fillna(0.0)
+    # types: assemble the typed columns into a fresh frame instead of
+    # copying the whole table and mutating it column by column
+    yr = pd.to_numeric(df["year"], errors="coerce")
+    ok = yr.notna().to_numpy()
+    df = pd.DataFrame({
+        "year": yr.to_numpy()[ok].astype(np.int64),
+        "exporter": df["exporter"].astype(str).to_numpy()[ok],
+        "importer": df["importer"].astype(str).to_numpy()[ok],
+        "hs6": df["hs6"].astype(str).to_numpy()[ok],
+        "value_usd": pd.to_numeric(df["value_usd"], errors="coerce").fillna(0.0).to_numpy()[ok],
+    }, copy=False)
 
     # choose target year and window
     y_target = year if year is not None else int(df["year"].max())
     y_min = y_target - (window - 1)
-    df = df[(df["year"] >= y_min) & (df["year"] <= y_target)].copy()
+    df = df[(df["year"] >= y_min) & (df["year"] <= y_target)]
     if df.empty:
         log(f"ERROR: no data in window {y_min}-{y_target}")
         sys.exit(2)
@@ -93,52 +139,62 @@ def load_pair(year: int | None, window: int = 4) -> tuple[pd.DataFrame, int]:
     return df, y_target, y_min
 
 # --- feature builders ---
-def build_hs6_shares(df: pd.DataFrame, y_target: int, top_hs6: int = 500) -> tuple[pd.DataFrame, list[str]]:
-    # Target-year totals by importer×hs6
-    cur = df[df["year"] == y_target].groupby(["importer","hs6"], as_index=False)["value_usd"].sum()
+def build_hs6_shares(df_target: pd.DataFrame, top_hs6: int = 500) -> tuple[pd.DataFrame, list[str]]:
+    # Target-year totals by importer×hs6 (caller passes the year slice)
+    cur = df_target.groupby(["importer","hs6"], as_index=False)["value_usd"].sum()
     # limit dimensionality: take top HS6 by global import in target year
     top_codes = (cur.groupby("hs6")["value_usd"].sum()
                    .sort_values(ascending=False).head(top_hs6).index.tolist())
-    cur = cur[cur["hs6"].isin(top_codes)].copy()
-    piv = cur.pivot_table(index="importer", columns="hs6", values="value_usd", aggfunc="sum", fill_value=0.0)
-    row_sum = piv.sum(axis=1)
-    piv = piv[row_sum > 0]
-    shares = piv.div(piv.sum(axis=1), axis=0).fillna(0.0)
+    cur = cur[cur["hs6"].isin(top_codes)]
+    # dense importer×hs6 matrix via one factorize + scatter-add instead of
+    # a second groupby pass inside pivot_table
+    imp_codes, imp_uniq = pd.factorize(cur["importer"], sort=True)
+    hs_codes = cur["hs6"].map({c: j for j, c in enumerate(top_codes)}).to_numpy(np.int64)
+    mat = np.zeros((len(imp_uniq), len(top_codes)), dtype=np.float64)
+    np.add.at(mat, (imp_codes, hs_codes), cur["value_usd"].to_numpy(np.float64))
+    row_sum = mat.sum(axis=1)
+    keep = row_sum > 0
+    shares = pd.DataFrame(mat[keep] / row_sum[keep, None],
+                          index=pd.Index(imp_uniq[keep], name="importer"),
+                          columns=top_codes)
     return shares, top_codes
 
-def build_hs6_cagr(df: pd.DataFrame, y_min: int, y_target: int, hs6_keep: list[str]) -> pd.DataFrame:
-    # 3y CAGR over window for each importer×hs6
-    # sum per year then compute CAGR between y_min and y_target
-    g = (df[df["hs6"].isin(hs6_keep)]
-           .groupby(["importer","hs6","year"], as_index=False)["value_usd"].sum())
-    base = g[g["year"] == y_min].set_index(["importer","hs6"])["value_usd"]
-    last = g[g["year"] == y_target].set_index(["importer","hs6"])["value_usd"]
-    idx = sorted(set(base.index).union(set(last.index)))
-    b = base.reindex(idx).fillna(0.0).values
-    l = last.reindex(idx).fillna(0.0).values
+def build_hs6_cagr(df_min: pd.DataFrame, df_target: pd.DataFrame,
+                   y_min: int, y_target: int, hs6_keep: list[str]) -> pd.DataFrame:
+    # CAGR between y_min and y_target for each importer×hs6: scatter-add the
+    # two endpoint-year slices straight into dense (importer, hs6) matrices —
+    # no set_index/union reindex and no pivot; absent cells stay 0 and yield
+    # cagr 0 exactly like the old fill_value
+    g = pd.concat([df_min, df_target], ignore_index=True)
+    g = g[g["hs6"].isin(hs6_keep)]
+    imp_codes, imp_uniq = pd.factorize(g["importer"], sort=True)
+    pos = {c: j for j, c in enumerate(hs6_keep)}
+    hs_codes = g["hs6"].map(pos).to_numpy(np.int64)
+    vals = g["value_usd"].to_numpy(np.float64)
+    is_base = g["year"].to_numpy() == y_min
+
+    base_mat = np.zeros((len(imp_uniq), len(hs6_keep)), dtype=np.float64)
+    last_mat = np.zeros_like(base_mat)
+    np.add.at(base_mat, (imp_codes[is_base], hs_codes[is_base]), vals[is_base])
+    np.add.at(last_mat, (imp_codes[~is_base], hs_codes[~is_base]), vals[~is_base])
+
     years = max(1, (y_target - y_min))
-    cagr = (np.power(safe_div(l + 1.0, b + 1.0), 1.0 / years) - 1.0)  # +1 smoothing
-    i_imp = [i for (i,_) in idx]
-    i_hs6 = [h for (_,h) in idx]
-    df_cagr = pd.DataFrame({"importer": i_imp, "hs6": i_hs6, "cagr": cagr})
-    piv = df_cagr.pivot_table(index="importer", columns="hs6", values="cagr", aggfunc="mean", fill_value=0.0)
-    # clip extreme values
-    piv = piv.clip(lower=-1.0, upper=1.0)
-    # align columns to hs6_keep order
-    for code in hs6_keep:
-        if code not in piv.columns: piv[code] = 0.0
-    piv = piv[hs6_keep]
-    return piv
-
-def build_partner_openness(df: pd.DataFrame, y_target: int) -> pd.DataFrame:
-    cur = df[df["year"] == y_target]
-    grp = cur.groupby(["importer","exporter"], as_index=False)["value_usd"].sum()
-    # shares per importer
-    tot = grp.groupby("importer")["value_usd"].transform("sum")
-    grp["share"] = safe_div(grp["value_usd"].values, tot.values)
-    # HHI = sum(share^2), top_share, n_partners (normalized)
-    feats = (grp.groupby("importer")
-                .agg(hhi=("share", lambda s: float(np.sum(np.square(s)))),
+    cagr = np.power(safe_div(last_mat + 1.0, base_mat + 1.0), 1.0 / years) - 1.0  # +1 smoothing
+    np.clip(cagr, -1.0, 1.0, out=cagr)  # clip extreme values
+    return pd.DataFrame(cagr, index=pd.Index(imp_uniq, name="importer"), columns=hs6_keep)
+
+def build_partner_openness(df_target: pd.DataFrame) -> pd.DataFrame:
+    grp = df_target.groupby(["importer","exporter"], as_index=False, sort=False)["value_usd"].sum()
+    # shares per importer: totals computed once and broadcast via merge
+    tot = (grp.groupby("importer", as_index=False, sort=False)["value_usd"].sum()
+              .rename(columns={"value_usd": "total"}))
+    grp = grp.merge(tot, on="importer", how="left", sort=False)
+    grp["share"] = safe_div(grp["value_usd"].to_numpy(), grp["total"].to_numpy())
+    # HHI = sum(share^2), top_share, n_partners (normalized); squaring up
+    # front keeps every aggregation on the cython path (no Python lambda)
+    grp["share2"] = np.square(grp["share"].to_numpy())
+    feats = (grp.groupby("importer", sort=False, observed=True)
+                .agg(hhi=("share2", "sum"),
                      top_share=("share", "max"),
                      n_partners=("exporter", "nunique"))
                 .reset_index())
@@ -160,10 +216,22 @@ def main():
 
     df, y_target, y_min = load_pair(year, window=window)
 
+    # slice years once: after a single stable sort every year is a
+    # contiguous block locatable via searchsorted, so the feature builders
+    # stop re-scanning the whole pair frame with boolean year masks
+    df = df.sort_values("year", kind="stable", ignore_index=True)
+    yrs = df["year"].to_numpy()
+
+    def year_slice(y: int) -> pd.DataFrame:
+        s, e = np.searchsorted(yrs, [y, y + 1])
+        return df.iloc[s:e]
+
+    df_target = year_slice(y_target)
+
     # features: shares (HS6), growth (CAGR), partner openness
-    shares, hs6_keep = build_hs6_shares(df, y_target, top_hs6=top_hs6)
-    cagr = build_hs6_cagr(df, y_min, y_target, hs6_keep=hs6_keep)
-    openx = build_partner_openness(df, y_target)
+    shares, hs6_keep = build_hs6_shares(df_target, top_hs6=top_hs6)
+    cagr = build_hs6_cagr(year_slice(y_min), df_target, y_min, y_target, hs6_keep=hs6_keep)
+    openx = build_partner_openness(df_target)
 
     # align indices
     idx = sorted(set(shares.index) & set(cagr.index) & set(openx.index))
@@ -189,7 +257,7 @@ def main():
     out["year"] = y_target
     # save
     OUT_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    out.to_parquet(OUT_PARQUET, index=False)
+    write_parquet(out, OUT_PARQUET)
     out.to_csv(OUT_CSV, index=False)
     log(f"Wrote: {OUT_PARQUET}")
     log(f"Wrote: {OUT_CSV}")
@@ -203,7 +271,7 @@ def main():
         feat[f"cagr_pc{j+1}"] = Zg[:, j]
     feat[["hhi","top_share","n_partners_norm"]] = openx[["hhi","top_share","n_partners_norm"]]
     feat = feat.reset_index().rename(columns={"index":"iso"})
-    feat.to_parquet(FEAT_PARQUET, index=False)
+    write_parquet(feat, FEAT_PARQUET)
     feat.to_csv(FEAT_CSV, index=False)
     log(f"Wrote features: {FEAT_PARQUET} and {FEAT_CSV}")
 
@@ -215,9 +283,12 @@ def main():
             i = iso_idx[key]
             Xn = X / np.clip(np.linalg.norm(X, axis=1, keepdims=True), 1e-12, None)
             sims = Xn @ Xn[i]
-            order = np.argsort(-sims)
+            # top-15 only: partition then sort the short head
+            k_top = min(15, len(sims))
+            topk_idx = np.argpartition(-sims, k_top - 1)[:k_top]
+            order = topk_idx[np.argsort(-sims[topk_idx])]
             log(f"Closest 15 to {key} (opportunity features):")
-            for t in order[:15]:
+            for t in order:
                 print(f"  {idx[t]:>4}  sim={float(sims[t]):.4f}  cluster={labels[t]}")
             break
     # smoke checks
@@ -13,7 +13,9 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 import math
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 
 ROOT = Path(__file__).resolve().parents[1]
 PATH = ROOT / "data" / "out" / "ui_shapes" / "map_rows.parquet"
@@ -33,12 +35,15 @@ def fail(msg: str):
 def main():
     if not PATH.exists():
         fail(f"missing file: {PATH}")
-    df = pd.read_parquet(PATH)
 
-    # Columns
-    missing = [c for c in REQ_COLS if c not in df.columns]
+    # Columns — check against the parquet footer, then decode only the
+    # required columns instead of the whole file
+    pf = pq.ParquetFile(PATH)
+    present = set(pf.schema_arrow.names)
+    missing = [c for c in REQ_COLS if c not in present]
     if missing:
         fail(f"missing columns: {missing}")
+    df = pf.read(columns=REQ_COLS).to_pandas()
 
     # Basic types / coercions
     for c in ["hs6", "year", "partner_id"]:
@@ -58,32 +63,44 @@ def main():
     # No NaNs in required numeric columns (except allowed zeros)
     num_cols = ["cz_curr","cz_prev","imp_total","cz_world","cz_world_prev",
                 "delta_export_abs","cz_share_in_partner_import","partner_share_in_cz_exports"]
-    nan_counts = df[num_cols].isna().sum()
-    nan_viol = nan_counts[nan_counts > 0]
-    if len(nan_viol):
+    # happy path: one C-level any() over the block; the per-column counts
+    # are only worth computing once a violation is known to exist
+    if df[num_cols].isna().to_numpy().any():
+        nan_counts = df[num_cols].isna().sum()
+        nan_viol = nan_counts[nan_counts > 0]
         fail(f"NaNs present in numeric columns: {nan_viol.to_dict()}")
 
     # Shares in [0,1] with tiny epsilon
     def out_of_range(s):
-        return ((s < -EPS) | (s > 1 + EPS)).sum()
+        arr = s.to_numpy()
+        bad = (arr < -EPS) | (arr > 1 + EPS)
+        if not bad.any():
+            return 0
+        return int(bad.sum())
     bad_partner_share = out_of_range(df["partner_share_in_cz_exports"])
     bad_cz_share = out_of_range(df["cz_share_in_partner_import"])
     if bad_partner_share or bad_cz_share:
         fail(f"share out-of-range rows: partner_share={bad_partner_share}, cz_share={bad_cz_share}")
 
-    # Delta consistency
-    delta_diff = (df["cz_curr"] - df["cz_prev"]) - df["delta_export_abs"]
-    bad_delta = (delta_diff.abs() > 1e-6).sum()
+    # Delta consistency — on raw ndarrays: the comparisons run as plain
+    # ufuncs without pandas index alignment or nan-op dispatch
+    cz_curr = df["cz_curr"].to_numpy()
+    cz_prev = df["cz_prev"].to_numpy()
+    delta = df["delta_export_abs"].to_numpy()
+    bad_mask = np.abs((cz_curr - cz_prev) - delta) > 1e-6
+    bad_delta = int(np.count_nonzero(bad_mask))
     if bad_delta:
         # print a small sample of bad rows
-        sample = df.loc[(delta_diff.abs() > 1e-6), ["hs6","year","partner_id","cz_curr","cz_prev","delta_export_abs"]].head(5)
+        sample = df.loc[bad_mask, ["hs6","year","partner_id","cz_curr","cz_prev","delta_export_abs"]].head(5)
         fail(f"delta mismatch in {bad_delta} rows; sample:\n{sample}")
 
     # Conditional zero checks (not failing, just warn)
-    zero_world = df[(df["cz_world"] <= EPS) & (df["partner_share_in_cz_exports"] > EPS)]
-    zero_imp = df[(df["imp_total"] <= EPS) & (df["cz_share_in_partner_import"] > EPS)]
-    if len(zero_world) or len(zero_imp):
-        print(f"WARN: non-zero shares with zero denominators: cz_world={len(zero_world)}, imp_total={len(zero_imp)}")
+    ps = df["partner_share_in_cz_exports"].to_numpy()
+    cs = df["cz_share_in_partner_import"].to_numpy()
+    zero_world = int(np.count_nonzero((df["cz_world"].to_numpy() <= EPS) & (ps > EPS)))
+    zero_imp = int(np.count_nonzero((df["imp_total"].to_numpy() <= EPS) & (cs > EPS)))
+    if zero_world or zero_imp:
+        print(f"WARN: non-zero shares with zero denominators: cz_world={zero_world}, imp_total={zero_imp}")
 
     # Summary
     rows = len(df)
@@ -29,29 +29,15 @@ def load_base_iso3() -> pd.Series:
     return iso.drop_duplicates().sort_values().reset_index(drop=True)
 
 
-# --- Human-logic groups (alpha-3 lists). We will map numeric->alpha3 via pycountry.
-# To avoid a hard dependency, we do mapping lazily and tolerate missing ones.
+# --- Human-logic groups (alpha-3 lists). Numeric->alpha3 comes from the
+# shared frozen table in etl.iso_codes (built once from pycountry).
 try:
-    import pycountry  # type: ignore
+    from etl.iso_codes import NUM2A3
 except Exception:
-    pycountry = None
-    log("WARN: pycountry not installed; some mappings may be skipped. Install with: pip install pycountry")
-
-if pycountry is None:
     log("ERROR: pycountry is required for numeric->alpha3 mapping. Install with: pip install pycountry")
     sys.exit(2)
 
 
-def num_to_a3(num_str: str) -> str | None:
-    if pycountry is None:
-        return None
-    try:
-        rec = pycountry.countries.get(numeric=str(int(num_str)).zfill(3))
-        return rec.alpha_3 if rec else None
-    except Exception:
-        return None
-
-
 # Define fine-grained groups using alpha-3 codes
 G = {
     0: ("EU Core West", [
@@ -133,26 +119,19 @@ for cid, (_name, members) in G.items():
 
 
 def assign_clusters(iso_numeric: pd.Series) -> Tuple[pd.DataFrame, List[str]]:
-    rows = []
-    missing_a3 = []
-    for num in iso_numeric:
-        a3 = num_to_a3(num)
-        if not a3:
-            missing_a3.append(num)
-            continue
-        cid = a3_to_cluster.get(a3)
-        if cid is None:
-            # not assigned => skip for now
-            missing_a3.append(num)
-            continue
-        rows.append({
-            "iso3": num,
-            "cluster": cid,
-            "method": METHOD,
-            "k": len(G),
-            "year": YEAR,
-        })
-    return pd.DataFrame(rows), sorted(set(missing_a3))
+    # Vectorized numeric -> alpha3 -> cluster resolution: two Series.map
+    # passes over precomputed dicts instead of per-row pycountry calls
+    key = pd.to_numeric(iso_numeric, errors="coerce").astype("Int64").astype(str).str.zfill(3)
+    cid = key.map(NUM2A3).map(a3_to_cluster)
+    ok = cid.notna()
+    out = pd.DataFrame({
+        "iso3": iso_numeric[ok].to_numpy(),
+        "cluster": cid[ok].to_numpy(dtype="int32"),
+        "method": METHOD,
+        "k": len(G),
+        "year": YEAR,
+    })
+    return out, sorted(set(iso_numeric[~ok]))
 
 
 def main():
@@ -1,5 +1,11 @@
 import os, json
 import pandas as pd
+from etl._cache import load_metrics
+
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
 
 ENRICHED = "data/out/metrics_enriched.parquet"
 BASIC    = "data/out/metrics.parquet"
@@ -7,10 +13,13 @@ OUT_DIR  = "data/out/ui_shapes"
 DST      = os.path.join(OUT_DIR, "controls.json")
 
 def main():
-    src = ENRICHED if os.path.isfile(ENRICHED) else BASIC
-    if not os.path.isfile(src):
-        raise FileNotFoundError(f"Missing metrics file: {src}")
-    df = pd.read_parquet(src)
+    if os.path.isfile(ENRICHED):
+        # shared memory-mapped mirror; only the two columns we need
+        df = load_metrics(columns=["partner_iso3", "year"])
+    elif os.path.isfile(BASIC):
+        df = pd.read_parquet(BASIC, columns=["partner_iso3", "year"])
+    else:
+        raise FileNotFoundError(f"Missing metrics file: {BASIC}")
 
     countries = sorted(df["partner_iso3"].dropna().unique().tolist())
     years     = sorted([int(y) for y in df["year"].dropna().unique().tolist()])
@@ -27,8 +36,13 @@ def main():
     ]
 
     os.makedirs(OUT_DIR, exist_ok=True)
-    with open(DST, "w") as f:
-        json.dump({"countries": countries, "years": years, "metrics": metrics}, f, indent=2)
+    payload = {"countries": countries, "years": years, "metrics": metrics}
+    if orjson is not None:
+        with open(DST, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(DST, "w") as f:
+            json.dump(payload, f, indent=2)
 
     print(f"[PASS] Wrote {DST}")
     print({"countries": countries[:5], "years": years, "metrics": metrics})
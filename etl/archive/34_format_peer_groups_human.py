@@ -1,5 +1,5 @@
 import pandas as pd
-import pycountry
+from etl.iso_codes import NUM2NAME
 
 INPUT = "data/out/peer_groups_human.csv"
 OUTPUT = "data/out/peer_groups_human_explained.csv"
@@ -7,15 +7,10 @@ OUTPUT = "data/out/peer_groups_human_explained.csv"
 # 1) Načti humánní skupiny
 df = pd.read_csv(INPUT, dtype={"iso3": str})
 
-# 2) Mapování ISO numeric -> jméno státu
-def num_to_name(num_str: str) -> str:
-    try:
-        rec = pycountry.countries.get(numeric=str(int(num_str)).zfill(3))
-        return rec.name if rec else num_str
-    except Exception:
-        return num_str
-
-df["country_name"] = df["iso3"].apply(num_to_name)
+# 2) Mapování ISO numeric -> jméno státu (sdílená zmrazená tabulka + Series.map
+#    místo volání pycountry pro každý řádek)
+key = pd.to_numeric(df["iso3"], errors="coerce").astype("Int64").astype(str).str.zfill(3)
+df["country_name"] = key.map(NUM2NAME).fillna(df["iso3"])
 
 # 3) Názvy a vysvětlení pro každou skupinu (matchuje definice v 33_build_peer_groups_human.py)
 cluster_meta = {
@@ -44,15 +39,21 @@ cluster_meta = {
     22: ("Oceania & Pacific", "Austrálie, NZ a Pacifik – vysoce otevřené trhy (ANZ) a malé ostrovní ekonomiky."),
 }
 
-# 4) Seskup a vytvoř prezentovatelný výstup
+# Oddělené dicty pro map() bez rozbalování tuple na každém řádku
+CLUSTER_NAME = {cid: name for cid, (name, _expl) in cluster_meta.items()}
+CLUSTER_EXPL = {cid: expl for cid, (_name, expl) in cluster_meta.items()}
+
+# 4) Seskup a vytvoř prezentovatelný výstup — jedno seřazení předem a
+#    C-úrovňový agg místo lambda se sorted() na každou skupinu
 grouped = (
-    df.groupby("cluster")["country_name"]
-      .apply(lambda lst: ", ".join(sorted(lst)))
+    df.sort_values("country_name")
+      .groupby("cluster")["country_name"]
+      .agg(", ".join)
       .reset_index()
 )
 
-grouped["grouping_name"] = grouped["cluster"].map(lambda c: cluster_meta.get(c, ("Group "+str(c), ""))[0])
-grouped["explanation"] = grouped["cluster"].map(lambda c: cluster_meta.get(c, ("", ""))[1])
+grouped["grouping_name"] = grouped["cluster"].map(CLUSTER_NAME).fillna("Group " + grouped["cluster"].astype(str))
+grouped["explanation"] = grouped["cluster"].map(CLUSTER_EXPL).fillna("")
 grouped = grouped.rename(columns={"cluster": "grouping_no", "country_name": "countries"})
 grouped = grouped[["grouping_no", "grouping_name", "countries", "explanation"]]
 
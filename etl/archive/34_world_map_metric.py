@@ -1,29 +1,41 @@
 import os, json
 import pandas as pd
-import pycountry
+from etl._cache import latest_year, load_metrics, metrics_columns
 from etl._env import env
+from etl.iso_codes import A3_2NAME
+
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
 
 SRC = "data/out/metrics_enriched.parquet"
 OUT_DIR = "data/out/ui_shapes"
 DST = os.path.join(OUT_DIR, "world_map.json")
 
-def iso3_to_name(code):
-    c = pycountry.countries.get(alpha_3=code)
-    return c.name if c else code
+def write_json(path, payload):
+    """Write a JSON-serializable payload, via orjson when available."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(payload, f)
 
 def main():
     if not os.path.isfile(SRC):
         raise FileNotFoundError(f"Missing {SRC}. Run 26_merge_peer_into_metrics.py first.")
-    df = pd.read_parquet(SRC)
-
-    # parameters via env vars with safe fallbacks
+    # validate the metric against the schema, then pull only the needed
+    # columns for the selected year from the shared memory-mapped mirror
     metric = env("METRIC", "delta_vs_peer", str)
-    if metric not in df.columns:
+    if metric not in metrics_columns():
         raise KeyError(f"Metric '{metric}' not found in columns")
+    cols = list(dict.fromkeys(["hs6", "partner_iso3", "export_cz_to_partner", metric]))
 
-    # year: default to latest available
-    year = env("YEAR", int(df["year"].max()), int)
-    cur = df[df["year"] == year].copy()
+    year = env("YEAR", None, int)
+    if year is None:
+        year = latest_year()
+    cur = load_metrics(columns=cols, year=year)
 
     # hs6: default to top by CZ export in that year if not provided
     hs6_env = env("HS6", None, str)
@@ -37,11 +49,11 @@ def main():
 
     # build world map for the selected hs6 & metric
     sub = cur[cur["hs6"] == sel_hs6][["partner_iso3", metric]].dropna().copy()
-    sub["name"] = sub["partner_iso3"].apply(iso3_to_name)
+    sub["name"] = sub["partner_iso3"].map(A3_2NAME).fillna(sub["partner_iso3"])
     world_map = sub.rename(columns={"partner_iso3":"iso3", metric:"value"})[["iso3","name","value"]]
 
     os.makedirs(OUT_DIR, exist_ok=True)
-    world_map.to_json(DST, orient="records")
+    write_json(DST, world_map.to_dict(orient="records"))
 
     print(f"[PASS] Wrote {DST} for year={year}, hs6={sel_hs6}, metric={metric}")
     print(world_map.head())
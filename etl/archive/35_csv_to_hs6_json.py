@@ -17,16 +17,16 @@ import os
 IN_PATH  = "ui/public/ref/HS6_CZ_map.csv"
 OUT_PATH = "ui/public/ref/hs6_labels.json"
 
+# delete-translation table: strips whitespace, quotes and any other
+# non-digit in one C-level pass instead of a per-character comprehension
+NON_DIGIT = str.maketrans("", "", "".join(chr(c) for c in range(256) if not chr(c).isdigit()))
+
 def pad_hs6(value: str) -> str:
-    v = value.strip().strip('"').strip("'")
-    # remove possible non-digits (safety), then pad
-    v = "".join(ch for ch in v if ch.isdigit())
+    v = value.translate(NON_DIGIT)
     if not v:
         raise ValueError(f"Empty/invalid HS6 code in input row: {value!r}")
-    if len(v) > 6:
-        # some sources include HS8/HS10; keep last 6 digits
-        v = v[-6:]
-    return v.zfill(6)
+    # some sources include HS8/HS10; keep last 6 digits
+    return v[-6:].zfill(6)
 
 def main():
     # Ensure input exists
@@ -35,23 +35,23 @@ def main():
 
     mapping = {}
     with open(IN_PATH, "r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
+        # positional reader: no per-row dict construction like DictReader
+        reader = csv.reader(f)
+        header = next(reader, None) or []
         # Allow both "HS6,POPIS" and "Hs6,Popis" variants (just in case)
-        # Normalize fieldnames
-        cols = { (name or "").strip().lower(): name for name in reader.fieldnames or [] }
-        col_code  = cols.get("hs6")
-        col_label = cols.get("popis")
-        if not col_code or not col_label:
-            raise SystemExit(f"Expected header with columns HS6, POPIS. Got: {reader.fieldnames}")
+        norm = [(name or "").strip().lower() for name in header]
+        try:
+            i_code = norm.index("hs6")
+            i_label = norm.index("popis")
+        except ValueError:
+            raise SystemExit(f"Expected header with columns HS6, POPIS. Got: {header}")
 
         for i, row in enumerate(reader, start=2):  # start=2 to account for header line=1
-            raw_code = str(row[col_code])
-            raw_lab  = str(row[col_label]) if row[col_label] is not None else ""
-            code = pad_hs6(raw_code)
-            label = raw_lab.strip()
+            code = pad_hs6(row[i_code])
+            label = (row[i_label] if len(row) > i_label else "").strip()
             if not label:
                 # Skip empty labels but warn
-                print(f"[warn] Empty POPIS at line {i} for code {raw_code!r}; skipping")
+                print(f"[warn] Empty POPIS at line {i} for code {row[i_code]!r}; skipping")
                 continue
             mapping[code] = label  # last one wins if duplicates
 
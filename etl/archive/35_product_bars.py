@@ -1,42 +1,66 @@
 import os
+import json
+import numpy as np
 import pandas as pd
+from etl._cache import latest_year, load_metrics
 from etl._env import env
 
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
+
 SRC = "data/out/metrics_enriched.parquet"
 CODES = "data/parquet/product_codes_HS22.parquet"
 OUT = "data/out/ui_shapes/product_bars.json"
 
+def write_json(path, payload):
+    """Write a JSON-serializable payload, via orjson when available."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(payload, f)
+
 def hs_names():
     if os.path.isfile(CODES):
-        df = pd.read_parquet(CODES, columns=["code","description"]).copy()
-        df["code"] = df["code"].astype("Int64").astype("string").str.pad(6, fillchar="0")
-        return dict(zip(df["code"], df["description"]))
+        df = pd.read_parquet(CODES, columns=["code","description"])
+        # one NumPy formatting pass instead of Int64 -> string -> pad copies
+        codes = np.char.zfill(df["code"].to_numpy().astype(np.int64).astype("U6"), 6)
+        return dict(zip(codes.tolist(), df["description"].tolist()))
     return {}
 
 def main():
     if not os.path.isfile(SRC):
         raise FileNotFoundError(f"Missing {SRC}")
-    df = pd.read_parquet(SRC)
-    year = env("YEAR", int(df["year"].max()), int)
+    year = env("YEAR", None, int)
+    if year is None:
+        year = latest_year()
     top  = env("TOP", 10, int)
 
-    cur = df[df["year"] == year]
+    # selected year only, from the shared memory-mapped mirror
+    cur = load_metrics(columns=["hs6", "export_cz_to_partner"], year=year)
     if cur.empty:
         raise RuntimeError(f"No data for year={year}")
 
-    # top HS6 by CZ export
-    bars = (cur.groupby("hs6")["export_cz_to_partner"]
-              .sum()
-              .nlargest(top)
-              .reset_index())
-    bars["id"] = bars["hs6"].astype(str).str.zfill(6)
-    bars = bars.rename(columns={"export_cz_to_partner":"value"})[["id","value"]]
+    # top HS6 by CZ export: group sums via factorize+bincount, then a
+    # partial top-k selection instead of sorting every HS6 group
+    codes, uniques = pd.factorize(cur["hs6"])
+    sums = np.bincount(codes, weights=cur["export_cz_to_partner"].to_numpy())
+    k_top = min(top, len(sums))
+    idx = np.argpartition(-sums, k_top - 1)[:k_top]
+    idx = idx[np.argsort(-sums[idx])]
+    bars = pd.DataFrame({
+        "id": pd.Index(uniques[idx]).astype(str).str.zfill(6),
+        "value": sums[idx],
+    })
 
     names = hs_names()
     bars["name"] = bars["id"].map(lambda x: names.get(x, x))
 
     os.makedirs(os.path.dirname(OUT), exist_ok=True)
-    bars.to_json(OUT, orient="records")
+    write_json(OUT, bars.to_dict(orient="records"))
     print(f"[PASS] Wrote {OUT} for year={year}, top={top}")
     print(bars.head())
 
@@ -1,43 +1,62 @@
 import os
+import json
 import pandas as pd
+from etl._cache import latest_year, load_metrics
 from etl._env import env
 
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
+
 SRC = "data/out/metrics_enriched.parquet"
 OUT = "data/out/ui_shapes/trend_mini.json"
 
+def write_json(path, payload):
+    """Write a JSON-serializable payload, via orjson when available."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(path, "w") as f:
+            json.dump(payload, f)
+
 def main():
     if not os.path.isfile(SRC):
         raise FileNotFoundError(f"Missing {SRC}")
-    df = pd.read_parquet(SRC)
-
     # Params
-    year = env("YEAR", int(df["year"].max()), int)
+    year = env("YEAR", None, int)
+    if year is None:
+        year = latest_year()
     hs6  = env("HS6", None, str)
     tail = env("YEARS", 10, int)  # number of most recent years to show
 
+    # Single read of the shared memory-mapped mirror serves both the HS6
+    # pick and the trend aggregation; the trailing window is pushed down
+    # so years outside it never reach pandas
+    hist = load_metrics(columns=["year", "hs6", "export_cz_to_partner"], min_year=year - tail + 1)
+
     # Pick HS6 if not provided: top by CZ export in selected year
-    cur_year = df[df["year"] == year]
-    if cur_year.empty:
-        raise RuntimeError(f"No data for year={year}")
     if not hs6:
-        top = cur_year.groupby("hs6")["export_cz_to_partner"].sum().sort_values(ascending=False)
-        if top.empty:
-            raise RuntimeError("No HS6 found for the selected year.")
-        hs6 = str(top.index[0]).zfill(6)
+        cur_year = hist[hist["year"] == year]
+        if cur_year.empty:
+            raise RuntimeError(f"No data for year={year}")
+        hs6 = str(cur_year.groupby("hs6", sort=False)["export_cz_to_partner"].sum().idxmax()).zfill(6)
     else:
         hs6 = str(hs6).zfill(6)
 
-    # Build trend: aggregate across partners (one point per year)
+    # Build trend: aggregate across partners (one point per year) over the
+    # trailing window for the selected HS6
+    hist = hist[hist["hs6"] == hs6]
     trend = (
-        df[df["hs6"] == hs6]
-        .groupby("year", as_index=False)["export_cz_to_partner"].sum()
+        hist.groupby("year", as_index=False)["export_cz_to_partner"].sum()
         .rename(columns={"export_cz_to_partner": "value"})
         .sort_values("year")
         .tail(tail)
     )
 
     os.makedirs(os.path.dirname(OUT), exist_ok=True)
-    trend.to_json(OUT, orient="records")
+    write_json(OUT, trend.to_dict(orient="records"))
     print(f"[PASS] Wrote {OUT} for hs6={hs6}, years={tail} (ending {trend['year'].max() if not trend.empty else 'N/A'})")
     print(trend.head())
 
@@ -2,6 +2,11 @@ import os, json
 import pandas as pd
 import numpy as np
 
+try:
+    import orjson  # optional: much faster JSON serialization
+except Exception:
+    orjson = None
+
 INPUT = "data/out/metrics.parquet"
 OUTPUT = "data/out/signals.json"
 
@@ -14,6 +19,16 @@ S3_YOY_SHARE_THRESHOLD = 0.20
 MAX_TOTAL = 10
 MAX_PER_TYPE = 4
 
+def _top_abs_indices(values: np.ndarray, threshold: float, limit: int) -> np.ndarray:
+    """Positions of the `limit` largest |values| above threshold, sorted
+    descending — one NumPy pass plus a partial partition instead of
+    dropna + abs column + full sort + head."""
+    intensity = np.abs(values)
+    idx = np.flatnonzero(~np.isnan(values) & (intensity >= threshold))
+    if idx.size > limit:
+        idx = idx[np.argpartition(-intensity[idx], limit - 1)[:limit]]
+    return idx[np.argsort(-intensity[idx], kind="stable")]
+
 def shortlist_signals(df: pd.DataFrame) -> list[dict]:
     # latest year
     year = int(df["year"].max())
@@ -24,37 +39,43 @@ def shortlist_signals(df: pd.DataFrame) -> list[dict]:
 
     items = []
 
+    years = cur["year"].to_numpy()
+    hs6s = cur["hs6"].to_numpy()
+    partners = cur["partner_iso3"].to_numpy()
+
     # --- Signal 2: YoY export change ---
-    s2 = cur[["year","hs6","partner_iso3","export_cz_to_partner","YoY_export_change"]].dropna(subset=["YoY_export_change"]).copy()
-    s2["intensity"] = s2["YoY_export_change"].abs()
-    s2 = s2[s2["intensity"] >= S2_YOY_THRESHOLD]
-    s2 = s2.sort_values("intensity", ascending=False).head(MAX_PER_TYPE)
-    for _, r in s2.iterrows():
-        items.append({
+    yoy2 = cur["YoY_export_change"].to_numpy()
+    top2 = _top_abs_indices(yoy2, S2_YOY_THRESHOLD, MAX_PER_TYPE)
+    vals2 = cur["export_cz_to_partner"].to_numpy()[top2]
+    items.extend(
+        {
             "type": "YoY_export_change",
-            "year": int(r["year"]),
-            "hs6": str(r["hs6"]),
-            "partner_iso3": r["partner_iso3"],
-            "intensity": float(r["intensity"]),
-            "value": float(r["export_cz_to_partner"]),
-            "yoy": float(r["YoY_export_change"])
-        })
+            "year": int(y),
+            "hs6": str(h),
+            "partner_iso3": p,
+            "intensity": float(abs(yo)),
+            "value": float(v),
+            "yoy": float(yo),
+        }
+        for y, h, p, v, yo in zip(years[top2], hs6s[top2], partners[top2], vals2, yoy2[top2])
+    )
 
     # --- Signal 3: YoY partner-share change ---
-    s3 = cur[["year","hs6","partner_iso3","partner_share_in_cz_exports","YoY_partner_share_change","export_cz_to_partner"]].dropna(subset=["YoY_partner_share_change"]).copy()
-    s3["intensity"] = s3["YoY_partner_share_change"].abs()
-    s3 = s3[s3["intensity"] >= S3_YOY_SHARE_THRESHOLD]
-    s3 = s3.sort_values("intensity", ascending=False).head(MAX_PER_TYPE)
-    for _, r in s3.iterrows():
-        items.append({
+    yoy3 = cur["YoY_partner_share_change"].to_numpy()
+    top3 = _top_abs_indices(yoy3, S3_YOY_SHARE_THRESHOLD, MAX_PER_TYPE)
+    vals3 = cur["partner_share_in_cz_exports"].to_numpy()[top3]
+    items.extend(
+        {
             "type": "YoY_partner_share_change",
-            "year": int(r["year"]),
-            "hs6": str(r["hs6"]),
-            "partner_iso3": r["partner_iso3"],
-            "intensity": float(r["intensity"]),
-            "value": float(r["partner_share_in_cz_exports"]),
-            "yoy": float(r["YoY_partner_share_change"])
-        })
+            "year": int(y),
+            "hs6": str(h),
+            "partner_iso3": p,
+            "intensity": float(abs(yo)),
+            "value": float(v),
+            "yoy": float(yo),
+        }
+        for y, h, p, v, yo in zip(years[top3], hs6s[top3], partners[top3], vals3, yoy3[top3])
+    )
 
     # Global sort by intensity and cut to MAX_TOTAL
     items = sorted(items, key=lambda x: x["intensity"], reverse=True)[:MAX_TOTAL]
@@ -65,8 +86,12 @@ def main():
     signals = shortlist_signals(df)
 
     os.makedirs(os.path.dirname(OUTPUT), exist_ok=True)
-    with open(OUTPUT, "w") as f:
-        json.dump(signals, f, indent=2)
+    if orjson is not None:
+        with open(OUTPUT, "wb") as f:
+            f.write(orjson.dumps(signals, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(OUTPUT, "w") as f:
+            json.dump(signals, f, indent=2)
 
     print(f"[PASS] Wrote {OUTPUT} with {len(signals)} signals")
     # tiny preview
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Run all three peer group creation scripts in parallel.
+
+The hs2, human and opportunity scripts are independent of each other, so
+a process pool overlaps their CSV parsing, pycountry initialization and
+parquet writes instead of paying for them back to back.
+"""
+
+import importlib
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# Make `etl.*` importable when run script-style (python etl/create_all_peer_groups.py)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+SCRIPTS = {
+    'hs2': 'create_peer_groups_hs2_parquet',
+    'human': 'create_peer_groups_human_parquet',
+    'opportunity': 'create_peer_groups_opportunity_parquet',
+}
+
+def run_one(key: str) -> str:
+    module = importlib.import_module(f"etl.{SCRIPTS[key]}")
+    module.main()
+    return key
+
+def main():
+    with ProcessPoolExecutor(max_workers=len(SCRIPTS)) as executor:
+        for key in executor.map(run_one, SCRIPTS):
+            print(f"✅ Finished {key} peer groups")
+
+if __name__ == "__main__":
+    main()
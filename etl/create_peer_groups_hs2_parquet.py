@@ -7,6 +7,8 @@ Updated to output alpha-3 ISO codes for consistency across the system.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 from pathlib import Path
 import sys
@@ -15,6 +17,11 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent / "api"))
 from utils.country_codes import name_to_iso3
 
+def is_valid_alpha3(s):
+    """Vectorized alpha-3 shape check via pandas C string kernels (no regex)."""
+    s = s.fillna('')
+    return s.str.len().eq(3) & s.str.isalpha() & s.str.isupper()
+
 def main():
     # Paths
     data_dir = Path(__file__).parent.parent / "data" / "out"
@@ -28,40 +35,40 @@ def main():
     df = pd.read_csv(input_file)
     
     # Expand countries from comma-separated strings to individual rows
-    expanded_rows = []
-    
-    for _, row in df.iterrows():
-        countries_str = row['countries']
-        group_no = row['grouping_no']
-        group_name = row['grouping_name']
-        
-        # Split countries by comma and clean up
-        if pd.notna(countries_str):
-            countries = [c.strip() for c in countries_str.split(',')]
-            
-            for country in countries:
-                # Skip numeric codes that might be artifacts
-                if country.isdigit():
-                    continue
-                
-                # Convert country name to alpha-3 ISO code
-                iso3_code = name_to_iso3(country)
-                if not iso3_code:
-                    print(f"Warning: Could not convert '{country}' to ISO3 code, skipping")
-                    continue
-                    
-                expanded_rows.append({
-                    'iso3': iso3_code,
-                    'cluster': group_no,
-                    'cluster_name': group_name,
-                    'methodology': 'trade_structure'
-                })
-    
+    # (vectorized explode; pycountry lookup runs once per unique name)
+    expanded = df.assign(country=df['countries'].fillna('').str.split(',')).explode('country')
+    expanded['country'] = expanded['country'].str.strip()
+
+    # Drop empties and numeric codes that might be artifacts
+    expanded = expanded[expanded['country'].ne('') & ~expanded['country'].str.isdigit()]
+
+    # Convert country names to alpha-3 ISO codes via a precomputed dict
+    name_map = {name: name_to_iso3(name) for name in expanded['country'].unique()}
+    for name, iso3_code in name_map.items():
+        if not iso3_code:
+            print(f"Warning: Could not convert '{name}' to ISO3 code, skipping")
+    expanded['iso3'] = expanded['country'].map(name_map)
+    expanded = expanded[expanded['iso3'].notna()]
+
     # Create the final dataframe
-    result_df = pd.DataFrame(expanded_rows)
+    result_df = pd.DataFrame({
+        'iso3': expanded['iso3'].to_numpy(),
+        'cluster': expanded['grouping_no'].to_numpy(),
+        'cluster_name': expanded['grouping_name'].to_numpy(),
+        'methodology': 'trade_structure'
+    })
     
-    # Save as parquet
-    result_df.to_parquet(output_file, index=False)
+    # Compact dtypes so parquet dictionary/RLE encoding packs them tightly
+    result_df['cluster'] = result_df['cluster'].astype('int32')
+    for col in ('iso3', 'cluster_name', 'methodology'):
+        result_df[col] = result_df[col].astype('category')
+
+    # Save as parquet (straight through pyarrow, skipping the pandas
+    # to_parquet wrapper and its second schema inference)
+    table = pa.Table.from_pandas(result_df, preserve_index=False)
+    pq.write_table(table, output_file, compression='snappy',
+                   use_dictionary=True, row_group_size=65536,
+                   data_page_size=1024 * 1024)
     
     print(f"Created {output_file} with {len(result_df)} country-cluster mappings")
     print(f"Unique clusters: {result_df['cluster'].nunique()}")
@@ -69,7 +76,7 @@ def main():
     print(result_df.head(10))
     
     # Validate that all codes are proper alpha-3
-    invalid_codes = result_df[~result_df['iso3'].str.match(r'^[A-Z]{3}$', na=False)]
+    invalid_codes = result_df[~is_valid_alpha3(result_df['iso3'].astype('object'))]
     if len(invalid_codes) > 0:
         print(f"Warning: Found {len(invalid_codes)} invalid ISO3 codes:")
         print(invalid_codes[['iso3']].head())
@@ -5,9 +5,32 @@ for the human peer groups methodology, excluding Czech Republic.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pycountry
 from pathlib import Path
 
+# Precomputed name -> alpha-3 lookup built once at import; replaces a
+# pycountry search_fuzzy scan over all countries per name
+NAME2ISO = {}
+for _c in pycountry.countries:
+    NAME2ISO[_c.name] = _c.alpha_3
+    for _attr in ('official_name', 'common_name'):
+        _n = getattr(_c, _attr, None)
+        if _n:
+            NAME2ISO[_n] = _c.alpha_3
+
+# The CSV's country lists are split on ',' before lookup, so composite
+# official names arrive as fragments; map the fragments that identify a
+# real country. Generic suffixes ('Republic of', 'State of', ...) stay
+# unmapped on purpose and are dropped with a warning.
+NAME2ISO.update({
+    'Korea': 'KOR',       # from 'Korea, Republic of'
+    'Micronesia': 'FSM',  # from 'Micronesia, Federated States of'
+    'Palestine': 'PSE',   # from 'Palestine, State of'
+    'Turkey': 'TUR',      # pycountry only knows 'Türkiye'
+})
+
 def main():
     # Paths
     data_dir = Path(__file__).parent.parent / "data" / "out"
@@ -21,66 +44,43 @@ def main():
     df = pd.read_csv(input_file)
     
     # Expand countries from comma-separated strings to individual rows
-    expanded_rows = []
-    
-    for _, row in df.iterrows():
-        countries_str = row['countries']
-        group_no = row['grouping_no']
-        
-        # Split countries by comma and clean up
-        if pd.notna(countries_str):
-            countries = [c.strip() for c in countries_str.split(',')]
-            
-            for country in countries:
-                    
-                # Convert country name to ISO3 if possible
-                iso3_code = None
-                try:
-                    # Try direct pycountry lookup
-                    country_rec = pycountry.countries.search_fuzzy(country.strip())
-                    if country_rec:
-                        iso3_code = country_rec[0].alpha_3
-                except Exception:
-                    # Manual mappings for common cases that pycountry might miss
-                    manual_mappings = {
-                        'Bolivia, Plurinational State of': 'BOL',
-                        'Congo': 'COG', 
-                        'Congo, The Democratic Republic of the': 'COD',
-                        'Côte d\'Ivoire': 'CIV',
-                        'Iran, Islamic Republic of': 'IRN',
-                        'Korea, Republic of': 'KOR',
-                        'Lao People\'s Democratic Republic': 'LAO',
-                        'Macao': 'MAC',
-                        'Moldova, Republic of': 'MDA',
-                        'Palestine, State of': 'PSE',
-                        'Russian Federation': 'RUS',
-                        'Syrian Arab Republic': 'SYR',
-                        'Tanzania, United Republic of': 'TZA',
-                        'Venezuela, Bolivarian Republic of': 'VEN'
-                    }
-                    iso3_code = manual_mappings.get(country.strip())
-                
-                if iso3_code:
-                    expanded_rows.append({
-                        'iso3': iso3_code,
-                        'cluster': group_no,
-                        'method': 'human_geo_econ_v2',
-                        'k': 23,  # Total number of clusters
-                        'year': 2023
-                    })
-                else:
-                    print(f"Warning: Could not map country '{country}' to ISO3 code")
-    
+    # (vectorized explode; ISO3 comes from the precomputed NAME2ISO dict)
+    expanded = df.assign(country=df['countries'].fillna('').str.split(',')).explode('country')
+    expanded['country'] = expanded['country'].str.strip()
+    expanded = expanded[expanded['country'].ne('')]
+
+    expanded['iso3'] = expanded['country'].map(NAME2ISO)
+    for name in expanded.loc[expanded['iso3'].isna(), 'country'].unique():
+        print(f"Warning: Could not map country '{name}' to ISO3 code")
+    expanded = expanded[expanded['iso3'].notna()]
+
     # Create the final dataframe
-    result_df = pd.DataFrame(expanded_rows)
+    result_df = pd.DataFrame({
+        'iso3': expanded['iso3'].to_numpy(),
+        'cluster': expanded['grouping_no'].to_numpy(),
+        'method': 'human_geo_econ_v2',
+        'k': 23,  # Total number of clusters
+        'year': 2023
+    })
     
-    # Save as parquet
-    result_df.to_parquet(output_file, index=False)
+    # Compact dtypes so parquet dictionary/RLE encoding packs them tightly
+    result_df['cluster'] = result_df['cluster'].astype('int32')
+    for col in ('iso3', 'method'):
+        result_df[col] = result_df[col].astype('category')
+    for col in ('k', 'year'):
+        result_df[col] = pd.to_numeric(result_df[col], downcast='unsigned')
+
+    # Save as parquet (straight through pyarrow, skipping the pandas
+    # to_parquet wrapper and its second schema inference)
+    table = pa.Table.from_pandas(result_df, preserve_index=False)
+    pq.write_table(table, output_file, compression='snappy',
+                   use_dictionary=True, row_group_size=65536,
+                   data_page_size=1024 * 1024)
     
     print(f"Created {output_file} with {len(result_df)} country-cluster mappings")
     print(f"Unique clusters: {result_df['cluster'].nunique()}")
     print(f"Countries per cluster:")
-    print(result_df.groupby('cluster').size().sort_index())
+    print(result_df['cluster'].value_counts(sort=False).sort_index())
     
     # Show sample
     print("Sample data:")
@@ -7,6 +7,8 @@ Updated to output alpha-3 ISO codes for consistency across the system.
 """
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
 from pathlib import Path
 import sys
@@ -15,6 +17,11 @@ import sys
 sys.path.append(str(Path(__file__).parent.parent / "api"))
 from utils.country_codes import normalize_country_code, bulk_convert_to_alpha3
 
+def is_valid_alpha3(s):
+    """Vectorized alpha-3 shape check via pandas C string kernels (no regex)."""
+    s = s.fillna('')
+    return s.str.len().eq(3) & s.str.isalpha() & s.str.isupper()
+
 def main():
     # Paths
     data_dir = Path(__file__).parent.parent / "data" / "out"
@@ -39,22 +46,18 @@ def main():
     # Convert numeric ISO codes to alpha-3
     print("\nConverting numeric ISO codes to alpha-3...")
     
+    # Bulk conversion in one pass (keeps the original value when it fails)
+    alpha3_codes = pd.Series(
+        bulk_convert_to_alpha3(df['iso'].astype(str).tolist()),
+        index=df.index, dtype="object"
+    )
+
     # Track conversion statistics
-    successful_conversions = 0
-    failed_conversions = 0
-    conversion_log = []
-    
-    alpha3_codes = []
-    for iso_code in df['iso']:
-        alpha3_code = normalize_country_code(str(iso_code), "alpha3")
-        if alpha3_code:
-            alpha3_codes.append(alpha3_code)
-            successful_conversions += 1
-        else:
-            alpha3_codes.append(str(iso_code))  # Keep original if conversion fails
-            failed_conversions += 1
-            conversion_log.append(f"Failed to convert: {iso_code}")
-    
+    failed_mask = ~is_valid_alpha3(alpha3_codes)
+    successful_conversions = int((~failed_mask).sum())
+    failed_conversions = int(failed_mask.sum())
+    conversion_log = [f"Failed to convert: {iso_code}" for iso_code in df.loc[failed_mask, 'iso']]
+
     # Update the dataframe
     df['iso3'] = alpha3_codes
     
@@ -76,8 +79,19 @@ def main():
         if len(conversion_log) > 10:
             print(f"  ... and {len(conversion_log) - 10} more")
     
-    # Save as parquet
-    df.to_parquet(output_file, index=False)
+    # Compact dtypes so parquet dictionary/RLE encoding packs them tightly
+    df['cluster'] = df['cluster'].astype('int32')
+    for col in ('iso3', 'method'):
+        df[col] = df[col].astype('category')
+    for col in ('k', 'year'):
+        df[col] = pd.to_numeric(df[col], downcast='unsigned')
+
+    # Save as parquet (straight through pyarrow, skipping the pandas
+    # to_parquet wrapper and its second schema inference)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, output_file, compression='snappy',
+                   use_dictionary=True, row_group_size=65536,
+                   data_page_size=1024 * 1024)
     
     print(f"\nCreated {output_file} with {len(df)} country-cluster mappings")
     print(f"Unique clusters: {df['cluster'].nunique()}")
@@ -87,12 +101,12 @@ def main():
     print(df.head(10))
     
     # Validate that all codes are proper alpha-3 where conversion succeeded
-    valid_alpha3 = df[df['iso3'].str.match(r'^[A-Z]{3}$', na=False)]
+    valid_alpha3 = df[is_valid_alpha3(df['iso3'].astype('object'))]
     print(f"\n✅ {len(valid_alpha3)} records have valid alpha-3 codes ({len(valid_alpha3)/len(df)*100:.1f}%)")
     
     # Show cluster distribution
     print(f"\nCluster distribution:")
-    cluster_counts = df.groupby('cluster')['iso3'].nunique().sort_values(ascending=False)
+    cluster_counts = df.drop_duplicates(['cluster', 'iso3'])['cluster'].value_counts()
     for cluster_id, count in cluster_counts.items():
         print(f"  Cluster {cluster_id}: {count} countries")
 
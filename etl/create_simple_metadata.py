@@ -10,28 +10,32 @@ import yaml
 def create_simple_metadata():
     """Create simple CSV files for metadata instead of JSON-in-CSV"""
     
-    # Countries - create a simple mapping
-    countries_data = []
-    
-    # Get unique countries from core trade data
-    core_df = pd.read_csv('data/deployment/core_trade.csv')
-    unique_countries = core_df['partner_iso3'].unique()
-    
-    for iso3 in unique_countries:
-        countries_data.append({'iso3': iso3, 'name': iso3})  # Use ISO3 as name for simplicity
-    
-    countries_df = pd.DataFrame(countries_data)
+    # Get unique countries and products from core trade data; read the
+    # two needed columns straight from the source parquet when available,
+    # otherwise stream the legacy CSV in chunks
+    unique_countries, unique_hs6 = set(), set()
+    parquet_path = 'data/deployment/core_trade.parquet'
+    if os.path.exists(parquet_path):
+        core_df = pd.read_parquet(parquet_path, columns=['partner_iso3', 'hs6'])
+        unique_countries.update(core_df['partner_iso3'].unique())
+        unique_hs6.update(core_df['hs6'].unique())
+    else:
+        for chunk in pd.read_csv('data/deployment/core_trade.csv',
+                                 usecols=['partner_iso3', 'hs6'],
+                                 dtype={'partner_iso3': 'category'},
+                                 chunksize=500_000):
+            unique_countries.update(chunk['partner_iso3'].cat.categories)
+            unique_hs6.update(chunk['hs6'].unique())
+
+    # Countries - create a simple mapping (use ISO3 as name for simplicity)
+    countries = sorted(unique_countries)
+    countries_df = pd.DataFrame({'iso3': countries, 'name': countries})
     countries_df.to_csv('data/deployment/countries.csv', index=False)
     print(f"Created countries.csv with {len(countries_df)} countries")
-    
-    # HS6 names - create simple mapping 
-    hs6_data = []
-    unique_hs6 = core_df['hs6'].unique()
-    
-    for hs6 in unique_hs6[:100]:  # Limit to first 100 for size
-        hs6_data.append({'hs6': hs6, 'name': f'Product {hs6}'})
-    
-    hs6_df = pd.DataFrame(hs6_data)
+
+    # HS6 names - create simple mapping (limit to first 100 for size)
+    hs6_codes = sorted(unique_hs6)[:100]
+    hs6_df = pd.DataFrame({'hs6': hs6_codes, 'name': [f'Product {h}' for h in hs6_codes]})
     hs6_df.to_csv('data/deployment/hs6_names.csv', index=False)
     print(f"Created hs6_names.csv with {len(hs6_df)} products")
     
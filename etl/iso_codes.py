@@ -0,0 +1,14 @@
+"""Frozen ISO country lookup tables.
+
+pycountry's database is static, so the scripts that translate codes
+should not pay its per-call get() dispatch and try/except setup. The
+dicts below are built once at import time; consumers use plain dict
+lookups or Series.map.
+"""
+import pycountry
+
+_COUNTRIES = list(pycountry.countries)
+
+NUM2A3 = {c.numeric: c.alpha_3 for c in _COUNTRIES}
+NUM2NAME = {c.numeric: c.name for c in _COUNTRIES}
+A3_2NAME = {c.alpha_3: c.name for c in _COUNTRIES}
@@ -11,6 +11,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from api.data.loaders import resolve_peers, load_peer_groups
 from api.peer_group_registry import PeerGroupRegistry
 
@@ -26,32 +29,39 @@ def validate_data_consistency():
     
     for name, filepath in files:
         try:
-            df = pd.read_parquet(filepath)
+            # Schema/row count come from the footer; only iso3 is decoded,
+            # and the checks run as Arrow compute kernels without pandas
+            pf = pq.ParquetFile(filepath)
+            columns = pf.schema_arrow.names
             print(f"\n{name.upper()} ({filepath}):")
-            print(f"  Shape: {df.shape}")
-            print(f"  Columns: {df.columns.tolist()}")
-            
+            print(f"  Shape: ({pf.metadata.num_rows}, {len(columns)})")
+            print(f"  Columns: {columns}")
+
             # Validate iso3 column exists and contains alpha-3 codes
-            if 'iso3' not in df.columns:
+            if 'iso3' not in columns:
                 print(f"  ❌ ERROR: Missing iso3 column")
                 continue
-            
+
+            col = pf.read(columns=['iso3']).column('iso3')
+            if pa.types.is_dictionary(col.type):
+                col = pc.cast(col, pa.string())
+
             # Check for alpha-3 format (3 character codes)
-            alpha3_count = df['iso3'].str.len().eq(3).sum()
-            total_count = len(df)
+            total_count = len(col)
+            alpha3_count = pc.sum(pc.equal(pc.utf8_length(col), 3)).as_py() or 0
             alpha3_pct = (alpha3_count / total_count) * 100 if total_count > 0 else 0
-            
+
             print(f"  Alpha-3 codes: {alpha3_count}/{total_count} ({alpha3_pct:.1f}%)")
-            
+
             # Show sample codes
-            sample_codes = sorted(df['iso3'].unique())[:10]
+            sample_codes = sorted(pc.unique(col.drop_null()).to_pylist())[:10]
             print(f"  Sample codes: {sample_codes}")
-            
+
             # Check for any remaining numeric codes (failure cases)
-            numeric_codes = df[df['iso3'].str.isdigit()]['iso3'].unique()
+            numeric_codes = pc.unique(col.filter(pc.utf8_is_digit(col))).to_pylist()
             if len(numeric_codes) > 0:
-                print(f"  ⚠️  Unconverted numeric codes: {numeric_codes.tolist()}")
-            
+                print(f"  ⚠️  Unconverted numeric codes: {numeric_codes}")
+
         except Exception as e:
             print(f"  ❌ ERROR loading {filepath}: {e}")
 
@@ -6,104 +6,167 @@ Validates that every country is included in exactly one peer group for every pee
 Identifies any gaps, duplicates, or inconsistencies in peer group assignments.
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import pycountry
-import os
+import sys
+import traceback
 from collections import defaultdict, Counter
-from typing import Dict, Set, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Set, List, Optional, Tuple
+
+# Peer group files live next to this script under data/out
+DATA_OUT = Path(__file__).resolve().parent / "data" / "out"
+
+# Precomputed lookup tables: one pycountry scan at import, O(1) per call.
+# Numeric maps are keyed by int so callers skip the zfill normalization.
+_NUMERIC2NAME = {int(c.numeric): c.name for c in pycountry.countries}
+_ALPHA3_2NAME = {c.alpha_3: c.name for c in pycountry.countries}
+_NUMERIC2ALPHA3 = {int(c.numeric): c.alpha_3 for c in pycountry.countries}
+_NAME2ALPHA3 = {}
+for _c in pycountry.countries:
+    _NAME2ALPHA3[_c.name] = _c.alpha_3
+    for _attr in ("official_name", "common_name"):
+        _name = getattr(_c, _attr, None)
+        if _name:
+            _NAME2ALPHA3[_name] = _c.alpha_3
 
 def numeric_to_name(iso_numeric):
     """Convert numeric ISO code to country name"""
     try:
-        country = pycountry.countries.get(numeric=str(iso_numeric).zfill(3))
-        return country.name if country else f'Unknown({iso_numeric})'
-    except:
+        return _NUMERIC2NAME.get(int(iso_numeric), f'Unknown({iso_numeric})')
+    except (TypeError, ValueError):
         return f'Unknown({iso_numeric})'
 
 def alpha3_to_name(iso_alpha3):
     """Convert alpha-3 ISO code to country name"""
-    try:
-        country = pycountry.countries.get(alpha_3=iso_alpha3)
-        return country.name if country else f'Unknown({iso_alpha3})'
-    except:
-        return f'Unknown({iso_alpha3})'
+    return _ALPHA3_2NAME.get(iso_alpha3, f'Unknown({iso_alpha3})')
+
+def to_alpha3(value, method):
+    """Normalize a methodology-specific country identifier to alpha-3"""
+    if method == "opportunity":
+        # Numeric ISO codes, possibly without leading zeros
+        try:
+            return _NUMERIC2ALPHA3.get(int(value))
+        except (TypeError, ValueError):
+            return None
+    if method == "trade_structure":
+        # Country names
+        return _NAME2ALPHA3.get(value)
+    # human already stores alpha-3 codes
+    return value if value in _ALPHA3_2NAME else None
 
 def validate_peer_groups():
     """Main validation function"""
     print("🔍 PEER GROUP VALIDATION REPORT")
     print("=" * 60)
-    
+
     # Define peer group files and their characteristics
     peer_group_configs = {
         "human": {
-            "file": "/Users/janindracek/Documents/mapa-prilezitosti/data/out/peer_groups_human.parquet",
+            "file": DATA_OUT / "peer_groups_human.parquet",
             "country_col": "iso3",
             "cluster_col": "cluster",
             "description": "Curated Regional Groups"
         },
         "trade_structure": {
-            "file": "/Users/janindracek/Documents/mapa-prilezitosti/data/out/peer_groups_hs2.parquet", 
+            "file": DATA_OUT / "peer_groups_hs2.parquet",
             "country_col": "country_name",
             "cluster_col": "cluster_id",
             "description": "Trade Structure Groups"
         },
         "opportunity": {
-            "file": "/Users/janindracek/Documents/mapa-prilezitosti/data/out/peer_groups_opportunity.parquet",
-            "country_col": "iso", 
+            "file": DATA_OUT / "peer_groups_opportunity.parquet",
+            "country_col": "iso",
             "cluster_col": "cluster",
             "description": "Export Opportunity Peers"
         }
     }
-    
-    all_results = {}
-    
-    for method, config in peer_group_configs.items():
-        print(f"\n📊 {method.upper()} METHODOLOGY - {config['description']}")
-        print("-" * 50)
-        
-        if not os.path.exists(config["file"]):
-            print(f"❌ File not found: {config['file']}")
-            continue
-            
+
+    def _process(method: str, config: Dict) -> Tuple[Optional[Dict], List[str]]:
+        """Validate one peer group file, buffering its report lines."""
+        out = [f"\n📊 {method.upper()} METHODOLOGY - {config['description']}", "-" * 50]
+
+        if not config["file"].is_file():
+            out.append(f"❌ File not found: {config['file']}")
+            return None, out
+
         try:
-            df = pd.read_parquet(config["file"])
-            print(f"✅ Loaded {len(df)} records from {config['file']}")
-            
-            # Basic statistics
-            clusters = sorted(df[config["cluster_col"]].unique())
-            print(f"📈 Clusters: {len(clusters)} total ({min(clusters)} to {max(clusters)})")
-            print(f"🌍 Countries: {len(df[config['country_col']].unique())} unique")
-            
+            # Only the two inspected columns; pre_buffer coalesces the
+            # column-chunk reads and memory_map avoids an extra copy
+            tbl = pq.read_table(
+                config["file"],
+                columns=[config["country_col"], config["cluster_col"]],
+                pre_buffer=True,
+                memory_map=True,
+            )
+            df = tbl.to_pandas()
+            # Low-cardinality identifier repeated per row — hash integer
+            # category codes in the groupbys instead of Python strings
+            df[config["country_col"]] = df[config["country_col"]].astype("category")
+            out.append(f"✅ Loaded {len(df)} records from {config['file']}")
+
+            # Basic statistics — counting runs as Arrow compute kernels on
+            # the table; only the small aggregates become pandas Series
+            vc = pc.value_counts(tbl.column(config["country_col"]))
+            country_counts = pd.Series(
+                vc.field("counts").to_numpy(),
+                index=vc.field("values").to_pylist(),
+            )
+            sizes = tbl.group_by(config["cluster_col"]).aggregate(
+                [(config["country_col"], "count_distinct")]
+            )
+            cluster_sizes = pd.Series(
+                sizes.column(f"{config['country_col']}_count_distinct").to_numpy(),
+                index=sizes.column(config["cluster_col"]).to_pylist(),
+            ).sort_index()
+            clusters = cluster_sizes.index.tolist()
+            out.append(f"📈 Clusters: {len(clusters)} total ({min(clusters)} to {max(clusters)})")
+            out.append(f"🌍 Countries: {country_counts.size} unique")
+
             # Check for duplicates
-            country_counts = df[config["country_col"]].value_counts()
             duplicates = country_counts[country_counts > 1]
-            
+
             if len(duplicates) > 0:
-                print(f"⚠️  DUPLICATES FOUND: {len(duplicates)} countries appear multiple times")
+                out.append(f"⚠️  DUPLICATES FOUND: {len(duplicates)} countries appear multiple times")
+                # One isin + groupby pass instead of a full scan per duplicate
+                dup_clusters = (
+                    df[df[config["country_col"]].isin(duplicates.index)]
+                    .groupby(config["country_col"], sort=False)[config["cluster_col"]]
+                    .apply(list)
+                )
                 for country, count in duplicates.items():
-                    clusters_for_country = df[df[config["country_col"]] == country][config["cluster_col"]].tolist()
-                    print(f"   • {country}: {count} times (clusters: {clusters_for_country})")
+                    out.append(f"   • {country}: {count} times (clusters: {dup_clusters[country]})")
             else:
-                print("✅ No duplicate countries found")
-            
-            # Analyze cluster distribution  
-            cluster_sizes = df.groupby(config["cluster_col"])[config["country_col"]].nunique().sort_values(ascending=False)
-            print(f"📊 Cluster sizes (countries per cluster):")
-            for cluster_id, size in cluster_sizes.items():
-                print(f"   • Cluster {cluster_id}: {size} countries")
-            
-            # Check for empty clusters
-            expected_clusters = set(range(len(clusters)))
-            actual_clusters = set(clusters)
-            missing_clusters = expected_clusters - actual_clusters
-            if missing_clusters:
-                print(f"⚠️  Missing cluster IDs: {sorted(missing_clusters)}")
-            
+                out.append("✅ No duplicate countries found")
+
+            # Analyze cluster distribution
+            out.append(f"📊 Cluster sizes (countries per cluster):")
+            for cluster_id, size in cluster_sizes.sort_values(ascending=False).items():
+                out.append(f"   • Cluster {cluster_id}: {size} countries")
+
+            # Check for gaps in the cluster ID range (IDs need not start at 0)
+            clusters_np = np.asarray(clusters)
+            missing_clusters = np.setdiff1d(
+                np.arange(clusters_np.min(), clusters_np.max() + 1),
+                clusters_np,
+                assume_unique=True,
+            )
+            if missing_clusters.size:
+                out.append(f"⚠️  Missing cluster IDs: {missing_clusters.tolist()}")
+
             # Show sample countries for each cluster (first 3)
-            print(f"🔍 Sample countries by cluster:")
-            for cluster_id in sorted(clusters):
-                countries_in_cluster = df[df[config["cluster_col"]] == cluster_id][config["country_col"]].tolist()[:3]
-                
+            # All clusters are grouped in a single pass; the per-cluster
+            # boolean masks would rescan the whole frame K times
+            groups = df.groupby(config["cluster_col"])[config["country_col"]].apply(list).to_dict()
+            out.append(f"🔍 Sample countries by cluster:")
+            # clusters comes from a sort_index()ed aggregate, already ordered
+            for cluster_id in clusters:
+                countries_in_cluster = groups[cluster_id][:3]
+
                 if method == "opportunity":
                     # Convert numeric codes to names for opportunity
                     country_names = [numeric_to_name(c) for c in countries_in_cluster]
@@ -113,74 +176,86 @@ def validate_peer_groups():
                 else:
                     # trade_structure already has country names
                     country_names = countries_in_cluster
-                    
-                total_in_cluster = len(df[df[config["cluster_col"]] == cluster_id])
-                print(f"   • Cluster {cluster_id}: {', '.join(country_names[:3])}{'...' if total_in_cluster > 3 else ''} ({total_in_cluster} total)")
-            
-            all_results[method] = {
-                "total_countries": len(df[config["country_col"]].unique()),
+
+                total_in_cluster = len(groups[cluster_id])
+                out.append(f"   • Cluster {cluster_id}: {', '.join(country_names)}{'...' if total_in_cluster > 3 else ''} ({total_in_cluster} total)")
+
+            result = {
+                "total_countries": country_counts.size,
                 "total_clusters": len(clusters),
                 "duplicates": len(duplicates),
                 "cluster_sizes": dict(cluster_sizes),
-                "countries": set(df[config["country_col"]].unique())
+                "countries": set(country_counts.index),
+                # Alpha-3 view so cross-methodology checks are plain set
+                # lookups regardless of each file's native code format
+                "countries_a3": {
+                    a3 for a3 in (to_alpha3(c, method) for c in country_counts.index) if a3
+                }
             }
-            
+            return result, out
+
         except Exception as e:
-            print(f"❌ Error processing {method}: {e}")
-            import traceback
-            traceback.print_exc()
-    
+            out.append(f"❌ Error processing {method}: {e}")
+            out.append(traceback.format_exc())
+            return None, out
+
+    all_results = {}
+
+    # The three files are independent and the work is IO plus Arrow decode,
+    # which releases the GIL — overlap them with a small thread pool and
+    # emit the buffered reports in the original order.
+    with ThreadPoolExecutor(max_workers=len(peer_group_configs)) as executor:
+        futures = {
+            method: executor.submit(_process, method, config)
+            for method, config in peer_group_configs.items()
+        }
+
+    # One write per report block instead of one syscall per line
+    for method, future in futures.items():
+        result, lines = future.result()
+        sys.stdout.write("\n".join(lines) + "\n")
+        if result is not None:
+            all_results[method] = result
+
     # Cross-methodology comparison
-    print(f"\n🔄 CROSS-METHODOLOGY COMPARISON")
-    print("-" * 50)
-    
+    summary = [f"\n🔄 CROSS-METHODOLOGY COMPARISON", "-" * 50]
+
     if len(all_results) >= 2:
         methods = list(all_results.keys())
-        
+
         # Compare total country counts
-        print("📊 Total countries per methodology:")
+        summary.append("📊 Total countries per methodology:")
+        for method in methods:
+            summary.append(f"   • {method}: {all_results[method]['total_countries']} countries")
+
+        # Set algebra on the normalized alpha-3 sets: one hash merge per
+        # comparison instead of per-country membership loops
+        ca3 = {m: all_results[m]['countries_a3'] for m in methods}
+        common = set.intersection(*ca3.values())
+        summary.append(f"\n🔗 Methodology coverage (alpha-3 normalized):")
+        summary.append(f"   • Countries in all methodologies: {len(common)}")
         for method in methods:
-            print(f"   • {method}: {all_results[method]['total_countries']} countries")
-        
+            only = ca3[method] - set.union(*(ca3[o] for o in methods if o != method))
+            if only:
+                summary.append(f"   • Only in {method}: {len(only)} ({sorted(only)[:5]}{'...' if len(only) > 5 else ''})")
+            else:
+                summary.append(f"   • Only in {method}: 0")
+
         # Check for Belgium specifically (user mentioned issue)
-        print(f"\n🔍 BELGIUM ANALYSIS:")
+        # The alpha-3 sets make the check uniform across methodologies
+        summary.append(f"\n🔍 BELGIUM ANALYSIS:")
         for method in methods:
-            if method == "opportunity":
-                # Belgium should be numeric code 056
-                belgium_codes = ["056", "56", "BEL"]  # Try different formats
-                found = False
-                for code in belgium_codes:
-                    if code in all_results[method]['countries']:
-                        print(f"   • {method}: Belgium found as '{code}' ✅")
-                        found = True
-                        break
-                if not found:
-                    print(f"   • {method}: Belgium NOT FOUND ❌")
-                    # Show first few countries to debug
-                    sample_countries = list(all_results[method]['countries'])[:10]
-                    print(f"     Sample countries: {sample_countries}")
-            elif method == "human":
-                if "BEL" in all_results[method]['countries']:
-                    print(f"   • {method}: Belgium found as 'BEL' ✅") 
-                else:
-                    print(f"   • {method}: Belgium NOT FOUND ❌")
-            elif method == "trade_structure":
-                belgium_names = ["Belgium", "België", "Belgique"]
-                found = False
-                for name in belgium_names:
-                    if name in all_results[method]['countries']:
-                        print(f"   • {method}: Belgium found as '{name}' ✅")
-                        found = True
-                        break
-                if not found:
-                    print(f"   • {method}: Belgium NOT FOUND ❌")
-                    # Show countries that might be Belgium
-                    possible_belgium = [c for c in all_results[method]['countries'] if 'belg' in c.lower()]
-                    if possible_belgium:
-                        print(f"     Possible Belgium matches: {possible_belgium}")
-    
-    print(f"\n✨ VALIDATION COMPLETE")
-    print("=" * 60)
+            if "BEL" in all_results[method]['countries_a3']:
+                summary.append(f"   • {method}: Belgium found ✅")
+            else:
+                summary.append(f"   • {method}: Belgium NOT FOUND ❌")
+                # Show first few countries to debug
+                sample_countries = sorted(all_results[method]['countries_a3'])[:10]
+                summary.append(f"     Sample countries: {sample_countries}")
+
+    summary.append(f"\n✨ VALIDATION COMPLETE")
+    summary.append("=" * 60)
+    sys.stdout.write("\n".join(summary) + "\n")
 
 if __name__ == "__main__":
-    validate_peer_groups()
\ No newline at end of file
+    validate_peer_groups()